@@ -0,0 +1,82 @@
+"""Batas waktu (latency budget) untuk rekomendasi AI.
+
+Request utama dimulai di awal halaman analisis. Jika sampai HEDGE_AFTER
+detik belum ada teks, dikirim hedged request ke model lain; mana pun yang
+lebih dulu mengirim teks yang ditampilkan. Jika sampai DEADLINE detik
+keduanya belum mengirim teks, halaman memakai rekomendasi dari cache
+(walaupun sudah kedaluwarsa) atau rule engine lokal di recommenders.py.
+
+Setiap hasil dicatat di OUTCOMES beserta waktunya (primary, hedge, cache,
+stale-cache, fallback, error) untuk menyetel angka-angka di bawah.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_SECONDS = float(os.getenv("GLUCOFFEE_AI_DEADLINE", "8"))
+# 0 berarti tidak pernah mengirim hedged request
+HEDGE_AFTER_SECONDS = float(os.getenv("GLUCOFFEE_AI_HEDGE_AFTER", "3"))
+POLL_SECONDS = 0.05
+
+
+class OutcomeLog:
+    """Catatan hasil dan waktu setiap permintaan rekomendasi (per proses)"""
+
+    def __init__(self, max_samples=500):
+        self.counts = {}
+        self._samples = {}
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+
+    def record(self, outcome, seconds):
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            samples = self._samples.setdefault(outcome, deque(maxlen=self.max_samples))
+            samples.append(seconds)
+        logger.info("rekomendasi AI: %s dalam %.3fs", outcome, seconds)
+
+    def summary(self):
+        """{outcome: {"count", "p50", "p95"}} dari sampel terakhir"""
+        with self._lock:
+            result = {}
+            for outcome, samples in self._samples.items():
+                ordered = sorted(samples)
+                result[outcome] = {
+                    "count": self.counts[outcome],
+                    "p50": ordered[int(0.50 * (len(ordered) - 1))],
+                    "p95": ordered[int(0.95 * (len(ordered) - 1))],
+                }
+            return result
+
+
+OUTCOMES = OutcomeLog()
+
+
+def await_first_token(primary, start_hedge, hedge_after=HEDGE_AFTER_SECONDS,
+                      deadline=DEADLINE_SECONDS):
+    """Tunggu teks pertama dari job utama, kirim hedge jika lambat
+
+    Waktu dihitung sejak job utama dimulai. `start_hedge()` dipanggil paling
+    banyak sekali dan harus mengembalikan job baru. Return (job, "primary" |
+    "hedge"), atau (None, None) jika deadline lewat atau semua job gagal.
+    Job yang selesai tanpa teks (respons kosong) dihitung gagal.
+    """
+    jobs = [(primary, "primary")]
+    while True:
+        elapsed = time.perf_counter() - primary.started_at
+        for job, label in jobs:
+            if job.has_text:
+                return job, label
+        if elapsed >= deadline:
+            return None, None
+        # Dicek sebelum "semua selesai": job utama yang cepat gagal tetap di-hedge
+        if hedge_after and len(jobs) == 1 and (elapsed >= hedge_after or primary.done):
+            jobs.append((start_hedge(), "hedge"))
+            continue
+        if all(job.done for job, _ in jobs):
+            return None, None
+        jobs[-1][0].wait_first_token(min(POLL_SECONDS, deadline - elapsed))
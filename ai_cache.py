@@ -0,0 +1,154 @@
+"""Cache rekomendasi AI (memori + disk).
+
+Rekomendasi Gemini untuk input yang sama praktis identik, jadi hasilnya
+disimpan dengan key berupa hash dari input prompt. Tier memori berupa LRU
+per proses, tier disk berupa satu file JSON per key dengan TTL dan batas
+ukuran total.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ai_prompt import PROMPT_VERSION
+from metrics import METRICS
+
+SUGAR_BUCKET = 5.0
+
+
+def bucket_sugar(value, bucket=SUGAR_BUCKET):
+    """Bulatkan angka gula ke kelipatan bucket terdekat"""
+    return round(float(value) / bucket) * bucket
+
+
+def recommendation_key(data, today_sugar, weekly_avg, bucket=SUGAR_BUCKET):
+    """Hash dari semua input yang menentukan isi prompt rekomendasi"""
+    findrisc = data['findrisc']
+    raw_answers = findrisc.get('raw_answers') or {}
+    has_coffee = len(data['coffee_history']) > 0
+    payload = {
+        "prompt_version": PROMPT_VERSION,
+        # Nama ikut di-hash karena AI menyapa user dengan namanya
+        "name": data['user_profile']['name'],
+        "score": findrisc['score'],
+        "risk_level": findrisc['risk_level'],
+        "usia": raw_answers.get('usia'),
+        "bmi": raw_answers.get('bmi'),
+        "today_sugar": bucket_sugar(today_sugar, bucket) if has_coffee else None,
+        "weekly_avg": bucket_sugar(weekly_avg, bucket) if has_coffee else None,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class RecommendationCache:
+    """Cache dua tier: LRU di memori lalu file JSON di disk"""
+
+    def __init__(self, folder, max_items=256, ttl_seconds=6 * 3600,
+                 max_disk_bytes=20 * 1024 * 1024, max_stale_seconds=7 * 24 * 3600):
+        self.folder = folder
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        # File kedaluwarsa disimpan sampai batas ini untuk fallback `allow_stale`
+        self.max_stale_seconds = max(max_stale_seconds, ttl_seconds)
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def _is_fresh(self, created_at, now):
+        return now - created_at < self.ttl_seconds
+
+    def get(self, key, allow_stale=False):
+        """Ambil teks rekomendasi, None jika tidak ada atau sudah kedaluwarsa
+
+        Dengan `allow_stale=True` entri kedaluwarsa yang belum di-evict tetap
+        dikembalikan (dipakai sebagai fallback saat AI melewati batas waktu).
+        """
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                created_at, text = item
+                fresh = self._is_fresh(created_at, now)
+                if allow_stale or fresh:
+                    self._memory.move_to_end(key)
+                    self._count("hit" if fresh else "stale", "memory")
+                    return text
+
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            self._count("miss")
+            return None
+
+        fresh = self._is_fresh(record['created_at'], now)
+        if not allow_stale and not fresh:
+            self._count("miss")
+            return None
+
+        self._remember(key, record['created_at'], record['text'])
+        self._count("hit" if fresh else "stale", "disk")
+        return record['text']
+
+    def _count(self, result, tier="none"):
+        METRICS.inc("glucoffee_cache_requests_total", cache="recommendation", result=result, tier=tier)
+
+    def put(self, key, text):
+        """Simpan teks rekomendasi ke memori dan disk"""
+        created_at = time.time()
+        self._remember(key, created_at, text)
+
+        # Tulis ke file sementara lalu rename agar pembaca tidak melihat file setengah jadi
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"created_at": created_at, "text": text}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def _remember(self, key, created_at, text):
+        with self._lock:
+            self._memory[key] = (created_at, text)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        """Hapus file yang melewati batas stale, lalu file terlama sampai di bawah batas ukuran"""
+        now = time.time()
+        files = []
+        for name in os.listdir(self.folder):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime >= self.max_stale_seconds:
+                self._remove_file(name[:-len('.json')])
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
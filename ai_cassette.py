@@ -0,0 +1,287 @@
+"""Rekam dan putar ulang panggilan Gemini (cassette) untuk benchmark offline.
+
+Mode dipilih lewat GLUCOFFEE_AI_MODE:
+
+- "live"   (default): panggil Gemini seperti biasa.
+- "record": panggil Gemini dan simpan setiap pasangan prompt/respons beserta
+  waktunya ke file cassette (JSON Lines).
+- "replay": tanpa jaringan dan tanpa API key; respons diambil dari cassette
+  dengan latensi sintetis.
+
+Opsi lain:
+
+    GLUCOFFEE_CASSETTE          path file cassette (default glucoffee_users/ai_cassette.jsonl)
+    GLUCOFFEE_CASSETTE_LATENCY  recorded | none | fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA
+                                latensi sampai potongan pertama (default recorded)
+    GLUCOFFEE_CASSETTE_ERRORS   peluang (0-1) sebuah panggilan replay gagal
+    GLUCOFFEE_CASSETTE_MISS     error | any: prompt yang tidak terekam di-raise
+                                sebagai CassetteMiss atau dijawab dengan rekaman lain
+    GLUCOFFEE_CASSETTE_SEED     seed angka acak latensi/error (default 0)
+
+Contoh: rekam sekali dengan `GLUCOFFEE_AI_MODE=record python prewarm_ai.py --force`,
+lalu jalankan app atau benchmark dengan `GLUCOFFEE_AI_MODE=replay`.
+
+Prompt berisi data pribadi user. Sebelum ditulis ke cassette, baris nama,
+skor FINDRISC, serta usia dan BMI di prompt disamarkan, begitu pula nama user
+di teks respons. Pencarian rekaman memakai hash prompt asli, jadi replay
+tetap cocok.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+AI_MODE = os.getenv("GLUCOFFEE_AI_MODE", "live")
+# Di folder data user (DATA_FOLDER di app.py), bukan di direktori kerja
+CASSETTE_PATH = os.getenv("GLUCOFFEE_CASSETTE", os.path.join("glucoffee_users", "ai_cassette.jsonl"))
+
+# Baris `kunci: nilai` di blok data prompt (ai_prompt.data_block) yang berisi data pribadi
+REDACTED_KEYS = ("nama", "findrisc", "usia")
+REDACTED = "[disamarkan]"
+_REDACT_LINE = re.compile(r"^(%s):.*$" % "|".join(REDACTED_KEYS), re.MULTILINE)
+_NAME_LINE = re.compile(r"^nama: (.+)$", re.MULTILINE)
+
+
+class CassetteMiss(LookupError):
+    """Prompt tidak ada di cassette (mode replay dengan GLUCOFFEE_CASSETTE_MISS=error)"""
+
+
+class ReplayError(RuntimeError):
+    """Error sintetis dari GLUCOFFEE_CASSETTE_ERRORS"""
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()
+
+
+def redact_prompt(prompt):
+    """Prompt dengan baris data pribadi diganti REDACTED"""
+    return _REDACT_LINE.sub(lambda match: f"{match.group(1)}: {REDACTED}", str(prompt))
+
+
+def redact_text(prompt, text):
+    """Teks respons dengan nama user (dari baris `nama:` di prompt) disamarkan"""
+    match = _NAME_LINE.search(str(prompt))
+    name = match.group(1).strip() if match else ""
+    if not name or name == "None":
+        return text
+    return text.replace(name, REDACTED)
+
+
+class Cassette:
+    """Isi satu file cassette: satu rekaman JSON per baris"""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+        self._by_model = {}
+        self._by_prompt = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._index(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue
+        logger.info("cassette %s: %d rekaman", path, len(self.records))
+
+    def _index(self, record):
+        self.records.append(record)
+        self._by_model[(record["model"], record["prompt_sha"])] = record
+        self._by_prompt.setdefault(record["prompt_sha"], record)
+
+    def append(self, record):
+        """Simpan rekaman baru di memori dan di akhir file"""
+        with self._lock:
+            self._index(record)
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def lookup(self, model_name, prompt, miss="error"):
+        """Rekaman untuk prompt ini: dari model yang sama, model lain, atau (miss=any) rekaman lain"""
+        sha = prompt_hash(prompt)
+        record = self._by_model.get((model_name, sha)) or self._by_prompt.get(sha)
+        if record is not None:
+            return record
+        if miss == "any" and self.records:
+            # Deterministik: prompt yang sama selalu mendapat rekaman yang sama
+            return self.records[int(sha, 16) % len(self.records)]
+        raise CassetteMiss(f"prompt {sha[:12]} tidak ada di cassette {self.path}")
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def open_cassette(path=None):
+    """Cassette untuk `path`, dibagi bersama dalam satu proses"""
+    path = path or CASSETTE_PATH
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+
+class LatencyModel:
+    """Latensi sintetis sampai potongan pertama, dari spesifikasi teks"""
+
+    def __init__(self, spec="recorded", seed=0):
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(value) for value in args.split(",") if value]
+        if kind not in ("recorded", "none", "fixed", "uniform", "lognormal"):
+            raise ValueError(f"latensi cassette tidak dikenal: {spec}")
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def first_token(self, recorded):
+        with self._lock:
+            if self.kind == "recorded":
+                return recorded
+            if self.kind == "none":
+                return 0.0
+            if self.kind == "fixed":
+                return self.args[0]
+            if self.kind == "uniform":
+                return self._random.uniform(self.args[0], self.args[1])
+            median, sigma = self.args
+            return self._random.lognormvariate(math.log(median), sigma)
+
+    def chunk_gap(self, recorded):
+        """Jeda antar potongan: rekaman asli, kecuali latensi dimatikan"""
+        return 0.0 if self.kind == "none" else recorded
+
+    def chance(self):
+        with self._lock:
+            return self._random.random()
+
+
+class ReplayChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class TokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class ReplayResponse:
+    """Pengganti respons SDK: punya `.text` dan bisa di-iterasi per potongan"""
+
+    def __init__(self, chunks, first_delay=0.0, gaps=None):
+        self.chunks = chunks
+        self.first_delay = first_delay
+        self.gaps = gaps or [0.0] * len(chunks)
+        self.text = "".join(chunks)
+
+    def __iter__(self):
+        for index, chunk in enumerate(self.chunks):
+            delay = self.first_delay if index == 0 else self.gaps[index]
+            if delay > 0:
+                time.sleep(delay)
+            yield ReplayChunk(chunk)
+
+    def resolve(self):
+        pass
+
+
+class ReplayModel:
+    """Pengganti GenerativeModel yang menjawab dari cassette"""
+
+    def __init__(self, name, cassette, latency=None, error_rate=None, miss=None):
+        self.model_name = name
+        self.cassette = cassette
+        self.latency = latency or LatencyModel(
+            os.getenv("GLUCOFFEE_CASSETTE_LATENCY", "recorded"),
+            int(os.getenv("GLUCOFFEE_CASSETTE_SEED", "0"))
+        )
+        self.error_rate = error_rate if error_rate is not None else float(
+            os.getenv("GLUCOFFEE_CASSETTE_ERRORS", "0")
+        )
+        self.miss = miss or os.getenv("GLUCOFFEE_CASSETTE_MISS", "error")
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        record = self.cassette.lookup(self.model_name, prompt, self.miss)
+        first_delay = self.latency.first_token(record["first_token_seconds"])
+        if self.error_rate and self.latency.chance() < self.error_rate:
+            time.sleep(first_delay)
+            raise ReplayError(f"error sintetis dari cassette ({self.model_name})")
+
+        chunks = record["chunks"] or [record["text"]]
+        gaps = [self.latency.chunk_gap(gap) for gap in record.get("chunk_gaps") or [0.0] * len(chunks)]
+        response = ReplayResponse(chunks, first_delay, gaps)
+        if stream:
+            return response
+        time.sleep(first_delay + sum(gaps[1:]))
+        return ReplayResponse(chunks)
+
+    def count_tokens(self, contents):
+        # Perkiraan kasar (±4 karakter per token) supaya kode penghitung token tetap jalan offline
+        return TokenCount(len(str(contents)) // 4)
+
+
+class RecordingModel:
+    """Bungkus GenerativeModel asli dan rekam setiap panggilan generate_content"""
+
+    def __init__(self, name, model, cassette):
+        self.model_name = name
+        self.model = model
+        self.cassette = cassette
+
+    def __getattr__(self, attr):
+        return getattr(self.model, attr)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        started = time.perf_counter()
+        response = self.model.generate_content(prompt, stream=stream, **kwargs)
+        if stream:
+            return self._record_stream(prompt, response, started)
+        elapsed = time.perf_counter() - started
+        self._save(prompt, [response.text], elapsed, [0.0])
+        return response
+
+    def _record_stream(self, prompt, response, started):
+        chunks, gaps = [], []
+        first_token = None
+        last = started
+        for chunk in response:
+            now = time.perf_counter()
+            if first_token is None:
+                first_token = now - started
+                gaps.append(0.0)
+            else:
+                gaps.append(now - last)
+            last = now
+            chunks.append(chunk.text)
+            yield chunk
+        self._save(prompt, chunks, first_token or 0.0, gaps)
+
+    def _save(self, prompt, chunks, first_token, gaps):
+        text = redact_text(prompt, "".join(chunks))
+        chunks = [redact_text(prompt, chunk) for chunk in chunks]
+        if "".join(chunks) != text:
+            # Nama terpotong di batas potongan: simpan sebagai satu potongan
+            chunks, gaps = [text], [0.0]
+        self.cassette.append({
+            "model": self.model_name,
+            "prompt_sha": prompt_hash(prompt),
+            "prompt": redact_prompt(prompt),
+            "text": text,
+            "chunks": chunks,
+            "first_token_seconds": round(first_token, 4),
+            "chunk_gaps": [round(gap, 4) for gap in gaps],
+            "recorded_at": time.time(),
+        })
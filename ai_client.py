@@ -0,0 +1,383 @@
+"""Setup model Gemini yang dipakai app.py dan tool command-line."""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from ai_cassette import AI_MODE, RecordingModel, ReplayModel, open_cassette
+from ai_prompt import generation_config
+from lazy_imports import lazy_module
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# SDK Gemini cukup berat di-import; baru dimuat saat model dibuat
+genai = lazy_module("google.generativeai")
+
+# Urutan fallback model, dari yang terbaru dan tercepat
+MODEL_NAMES = ["gemini-2.0-flash-exp", "gemini-1.5-flash", "gemini-pro"]
+
+
+def get_api_key():
+    """Ambil API key dari environment variable (.env sudah di-load pemanggil)"""
+    return os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+
+
+# Circuit breaker: buka setelah sekian kegagalan berturut-turut, coba lagi setelah cooldown
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 60
+# Bobot sampel terbaru pada rata-rata latensi (EWMA)
+LATENCY_ALPHA = 0.3
+PROBE_PROMPT = "Balas dengan satu kata: ok"
+# Batas request Gemini keluar untuk seluruh proses (semua session dan thread)
+MAX_CONCURRENT_REQUESTS = int(os.getenv("GLUCOFFEE_AI_MAX_CONCURRENT", "4"))
+REQUESTS_PER_MINUTE = float(os.getenv("GLUCOFFEE_AI_RATE", "60"))
+
+
+class ModelRoute:
+    """Satu model Gemini beserta statistik kesehatannya"""
+
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+        self.latency = None
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.last_error = None
+        # Request percobaan yang sedang berjalan saat circuit half-open
+        self.trial_in_flight = False
+
+    def state(self, now):
+        if self.consecutive_failures < FAILURE_THRESHOLD:
+            return "closed"
+        return "open" if now < self.open_until else "half-open"
+
+
+class ModelRouter:
+    """Kirim request ke model sehat tercepat, dengan fallback dan circuit breaker
+
+    Punya method `generate_content` yang sama dengan GenerativeModel, jadi bisa
+    dipakai di mana pun model dipakai. Latensi (untuk streaming: waktu sampai
+    potongan pertama) dan error dicatat per model. Model yang gagal
+    FAILURE_THRESHOLD kali berturut-turut dilewati selama COOLDOWN_SECONDS,
+    lalu diberi satu kesempatan lagi (half-open): hanya satu request yang
+    mencoba model itu, request lain melewatinya sampai percobaan selesai.
+
+    Jika `gate` diisi, setiap panggilan (termasuk probe) menunggu slot dari
+    gate dulu; untuk streaming, slot baru dilepas setelah stream habis dibaca.
+    """
+
+    def __init__(self, routes, gate=None):
+        self.routes = routes
+        self.gate = gate
+        self._lock = threading.Lock()
+
+    def candidates(self):
+        """Model yang boleh dicoba, tercepat lebih dulu (yang belum terukur di belakang)"""
+        now = time.monotonic()
+        with self._lock:
+            usable = [
+                (index, route) for index, route in enumerate(self.routes)
+                if route.state(now) == "closed"
+                or (route.state(now) == "half-open" and not route.trial_in_flight)
+            ]
+        usable.sort(key=lambda item: (item[1].latency is None, item[1].latency or 0, item[0]))
+        return [route for _, route in usable]
+
+    def _claim(self, route):
+        """False jika route half-open sudah sedang dicoba request lain"""
+        with self._lock:
+            state = route.state(time.monotonic())
+            if state == "open" or (state == "half-open" and route.trial_in_flight):
+                return False
+            if state == "half-open":
+                route.trial_in_flight = True
+            return True
+
+    def record_success(self, route, latency):
+        METRICS.observe("glucoffee_ai_request_seconds", latency, model=route.name)
+        with self._lock:
+            route.requests += 1
+            route.consecutive_failures = 0
+            route.trial_in_flight = False
+            if route.latency is None:
+                route.latency = latency
+            else:
+                route.latency += LATENCY_ALPHA * (latency - route.latency)
+
+    def record_failure(self, route, error):
+        METRICS.inc("glucoffee_ai_errors_total", model=route.name, error=type(error).__name__)
+        with self._lock:
+            route.requests += 1
+            route.errors += 1
+            route.consecutive_failures += 1
+            route.last_error = str(error)
+            route.trial_in_flight = False
+            if route.consecutive_failures >= FAILURE_THRESHOLD:
+                route.open_until = time.monotonic() + COOLDOWN_SECONDS
+
+    def generate_content(self, prompt, stream=False, skip_fastest=False, **kwargs):
+        """Panggil model sehat tercepat; pindah ke model berikutnya jika gagal
+
+        `skip_fastest=True` dipakai untuk hedged request: model tercepat (yang
+        kemungkinan sedang melayani request utama) dilewati jika ada alternatif.
+        """
+        # Termasuk waktu menunggu slot gate; untuk streaming sampai potongan pertama
+        with METRICS.span("generate_content"):
+            return self._gated_generate(prompt, stream, skip_fastest, **kwargs)
+
+    def _gated_generate(self, prompt, stream, skip_fastest, **kwargs):
+        if self.gate is None:
+            return self._generate(prompt, stream, skip_fastest, **kwargs)
+        self.gate.acquire()
+        try:
+            response = self._generate(prompt, stream, skip_fastest, **kwargs)
+        except BaseException:
+            self.gate.release()
+            raise
+        if not stream:
+            self.gate.release()
+            return response
+        return _GatedStream(response, self.gate.release)
+
+    def _generate(self, prompt, stream, skip_fastest, **kwargs):
+        candidates = self.candidates()
+        if skip_fastest and len(candidates) > 1:
+            candidates = candidates[1:]
+        last_error = None
+        for route in candidates:
+            if not self._claim(route):
+                continue
+            started = time.perf_counter()
+            try:
+                response = route.model.generate_content(prompt, stream=stream, **kwargs)
+                if stream:
+                    # Error koneksi pada streaming baru muncul saat potongan pertama dibaca
+                    chunks = iter(response)
+                    first = next(chunks, None)
+                    self.record_success(route, time.perf_counter() - started)
+                    return _chain_chunks(first, chunks)
+                self.record_success(route, time.perf_counter() - started)
+                return response
+            except Exception as e:
+                self.record_failure(route, e)
+                last_error = e
+        if last_error is None:
+            raise RuntimeError("Semua model AI sedang tidak tersedia, coba lagi nanti.")
+        raise last_error
+
+    def probe(self):
+        """Kirim prompt kecil ke setiap model untuk mengukur latensi dan kesehatannya"""
+        for route in self.routes:
+            started = time.perf_counter()
+            try:
+                with self._slot():
+                    route.model.generate_content(
+                        PROBE_PROMPT,
+                        generation_config=generation_config("probe")
+                    )
+            except Exception as e:
+                self.record_failure(route, e)
+            else:
+                self.record_success(route, time.perf_counter() - started)
+
+    def count_tokens(self, contents):
+        """count_tokens lewat model sehat tercepat (tokenizer semua model Gemini sama)"""
+        candidates = self.candidates() or self.routes
+        with self._slot():
+            return candidates[0].model.count_tokens(contents)
+
+    @contextmanager
+    def _slot(self):
+        if self.gate is None:
+            yield
+        else:
+            with self.gate.slot():
+                yield
+
+    def start_probe(self):
+        """Jalankan probe di thread background supaya startup tidak tertahan"""
+        thread = threading.Thread(target=self.probe, daemon=True)
+        thread.start()
+        return thread
+
+    def snapshot(self):
+        """Statistik per model (untuk ditampilkan atau dicatat)"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "model": route.name,
+                    "state": route.state(now),
+                    "latency_seconds": route.latency,
+                    "requests": route.requests,
+                    "errors": route.errors,
+                    "last_error": route.last_error,
+                }
+                for route in self.routes
+            ]
+
+
+def _chain_chunks(first, chunks):
+    if first is None:
+        return
+    yield first
+    yield from chunks
+
+
+class _GatedStream:
+    """Iterator stream yang melepas slot gate tepat sekali: saat habis, error, atau ditutup"""
+
+    def __init__(self, chunks, release):
+        self._chunks = iter(chunks)
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+    def __del__(self):
+        # Jaring pengaman saja; pemakai stream harus memanggil close()
+        self.close()
+
+
+def create_model(api_key, probe=None, gate=None):
+    """Konfigurasi Gemini dan buat router untuk semua model di MODEL_NAMES
+
+    Probe kesehatan berjalan di background kecuali GLUCOFFEE_AI_PROBE=0.
+    Tanpa `gate`, router memakai REQUEST_GATE milik proses. Dengan
+    GLUCOFFEE_AI_MODE=record/replay setiap model direkam ke atau diputar dari
+    cassette (lihat ai_cassette.py); mode replay tidak memerlukan API key.
+    """
+    if AI_MODE == "replay":
+        # Tanpa probe: latensi diatur oleh cassette, bukan diukur
+        cassette = open_cassette()
+        routes = [ModelRoute(name, ReplayModel(name, cassette)) for name in MODEL_NAMES]
+        return ModelRouter(routes, gate=gate or REQUEST_GATE)
+
+    genai.configure(api_key=api_key)
+    cassette = open_cassette() if AI_MODE == "record" else None
+    routes = []
+    for name in MODEL_NAMES:
+        try:
+            model = genai.GenerativeModel(name)
+        except Exception:
+            continue
+        if cassette is not None:
+            model = RecordingModel(name, model, cassette)
+        routes.append(ModelRoute(name, model))
+    if not routes:
+        return None
+
+    router = ModelRouter(routes, gate=gate or REQUEST_GATE)
+    if probe is None:
+        probe = os.getenv("GLUCOFFEE_AI_PROBE", "1") != "0"
+    if probe:
+        router.start_probe()
+    return router
+
+
+class RateLimiter:
+    """Token bucket sederhana: maksimal `rate` request per detik"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Tunggu sampai ada token, lalu pakai satu"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RequestGate:
+    """Semaphore + token bucket untuk request keluar
+
+    Request yang melebihi batas menunggu giliran (antre), tidak digagalkan.
+    `per_minute=0` berarti hanya batas konkurensi yang berlaku.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_REQUESTS, per_minute=REQUESTS_PER_MINUTE):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrent)
+        self._limiter = RateLimiter(per_minute / 60.0, burst=self.max_concurrent) if per_minute else None
+        self.active = 0
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self.waiting += 1
+        if not self._semaphore.acquire(blocking=False):
+            logger.info("AI request antre: %d request sedang berjalan", self.max_concurrent)
+            self._semaphore.acquire()
+        try:
+            if self._limiter is not None:
+                self._limiter.acquire()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        with self._lock:
+            self.active += 1
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        self._semaphore.release()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            return {"active": self.active, "waiting": self.waiting,
+                    "max_concurrent": self.max_concurrent}
+
+
+# Dipakai bersama oleh semua router di proses ini (semua session Streamlit)
+REQUEST_GATE = RequestGate()
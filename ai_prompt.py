@@ -0,0 +1,127 @@
+"""Template prompt, pengaturan generasi, dan penghitungan token AI GluCoffee.
+
+Dipakai bersama oleh halaman Hasil Analisis di app.py dan tool command-line,
+supaya prompt yang dikirim ke Gemini selalu identik.
+
+Template di-compile sekali saat import. Data user dikirim sebagai blok
+ringkas `kunci: nilai` (hanya field yang ada), dan setiap konteks halaman
+punya generation_config sendiri sehingga panjang jawaban (dan latensinya)
+terkendali lewat `max_output_tokens`, bukan hanya lewat instruksi.
+
+Set GLUCOFFEE_AI_TOKEN_REPORT=1 untuk mencatat jumlah token prompt dan
+respons setiap panggilan ke log.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from string import Template
+
+logger = logging.getLogger(__name__)
+
+# Naikkan jika isi template berubah, supaya cache rekomendasi lama tidak dipakai lagi
+PROMPT_VERSION = 2
+TOKEN_REPORT = os.getenv("GLUCOFFEE_AI_TOKEN_REPORT", "0") == "1"
+
+# Batas kata di instruksi dijaga di bawah max_output_tokens (±2 token per kata
+# bahasa Indonesia plus markdown/emoji) supaya jawaban selesai, tidak terpotong
+ANALYSIS_WORDS = 350
+GENERATION_CONFIGS = {
+    "analysis": {"max_output_tokens": 1024, "temperature": 0.7, "top_p": 0.9},
+    "probe": {"max_output_tokens": 5, "temperature": 0.0},
+}
+
+ANALYSIS_TEMPLATE = Template("""Anda GluCoffee AI Assistant, ahli nutrisi dan diabetes educator.
+
+DATA PENGGUNA:
+$data
+
+TUGAS (bahasa Indonesia, maksimal $words kata, dengan emoji, judul markdown per bagian):
+1. Sapaan hangat dengan nama
+2. Analisis hubungan FINDRISC dengan pola konsumsi gula
+3. Rekomendasi meal plan hari ini berdasarkan sisa kuota
+4. Tips memilih kopi lebih sehat
+5. Action plan 3 hari ke depan
+6. Motivasi penutup""")
+
+
+def generation_config(context):
+    """generation_config untuk konteks halaman ("analysis", "probe")"""
+    return dict(GENERATION_CONFIGS[context])
+
+
+def data_block(data, today_sugar, weekly_avg):
+    """Blok data ringkas `kunci: nilai`, hanya untuk data yang tersedia"""
+    lines = [f"nama: {data['user_profile']['name']}"]
+
+    findrisc = data['findrisc']
+    if findrisc['score'] is not None:
+        raw_answers = findrisc.get('raw_answers') or {}
+        lines.append(f"findrisc: {findrisc['score']} poin, risiko {findrisc['risk_level']}")
+        lines.append(f"usia: {raw_answers.get('usia', 'N/A')}; bmi: {raw_answers.get('bmi', 'N/A')}")
+
+    if data['coffee_history']:
+        lines.append(
+            f"gula_kopi_hari_ini: {today_sugar:.1f} g (batas 50 g, sisa {max(0, 50 - today_sugar):.1f} g)"
+        )
+        lines.append(f"rata2_7_hari: {weekly_avg:.1f} g/hari")
+    return "\n".join(lines)
+
+
+def build_prompt(data, today_sugar, weekly_avg):
+    """Susun prompt rekomendasi dari dokumen user"""
+    return ANALYSIS_TEMPLATE.substitute(
+        data=data_block(data, today_sugar, weekly_avg),
+        words=ANALYSIS_WORDS
+    )
+
+
+class TokenCounter:
+    """`count_tokens` dengan cache per isi teks, plus total untuk laporan"""
+
+    def __init__(self, max_items=1024):
+        self.max_items = max_items
+        self.totals = {"calls": 0, "prompt_tokens": 0, "response_tokens": 0}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, model, text):
+        """Jumlah token `text`; perkiraan ±4 karakter per token jika API gagal"""
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        try:
+            tokens = model.count_tokens(text).total_tokens
+        except Exception as e:
+            logger.debug("count_tokens gagal, memakai perkiraan: %s", e)
+            return len(text) // 4
+        with self._lock:
+            self._cache[key] = tokens
+            while len(self._cache) > self.max_items:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def report(self, model, prompt, text, usage=None, context="analysis"):
+        """Catat token prompt dan respons satu panggilan (pakai usage_metadata jika ada)"""
+        if usage is not None and getattr(usage, "candidates_token_count", None):
+            prompt_tokens = usage.prompt_token_count
+            response_tokens = usage.candidates_token_count
+        else:
+            prompt_tokens = self.count(model, prompt)
+            response_tokens = self.count(model, text)
+        with self._lock:
+            self.totals["calls"] += 1
+            self.totals["prompt_tokens"] += prompt_tokens
+            self.totals["response_tokens"] += response_tokens
+        logger.info(
+            "token AI [%s]: prompt=%d respons=%d (batas %s)",
+            context, prompt_tokens, response_tokens,
+            GENERATION_CONFIGS.get(context, {}).get("max_output_tokens", "-")
+        )
+        return prompt_tokens, response_tokens
+
+
+TOKENS = TokenCounter()
@@ -0,0 +1,194 @@
+"""Streaming rekomendasi AI di thread background.
+
+Request ke Gemini dimulai di awal halaman Hasil Analisis, sehingga section
+FINDRISC, grafik, dan riwayat bisa tampil selagi model masih berpikir.
+Potongan teks disimpan di job dan bisa dibaca ulang dari awal oleh rerun
+berikutnya tanpa memanggil API lagi.
+
+IN_FLIGHT menggabungkan permintaan yang sama dari banyak session: selama job
+untuk key yang sama masih berjalan, session lain ikut membaca job itu alih-alih
+mengirim request baru ke Gemini.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from ai_prompt import TOKEN_REPORT, TOKENS
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationStream:
+    """Job streaming `generate_content(stream=True)` di thread background"""
+
+    def __init__(self, model, prompt, key=None, on_complete=None, request_kwargs=None):
+        self.model = model
+        self.prompt = prompt
+        self.key = key
+        self.request_kwargs = request_kwargs or {}
+        self.on_complete = on_complete
+        self.parts = []
+        self.error = None
+        self.done = False
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.usage = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def time_to_first_token(self):
+        """Detik sejak request dikirim sampai potongan teks pertama tiba"""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total_time(self):
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def _run(self):
+        finished_at = None
+        response = None
+        try:
+            try:
+                response = self.model.generate_content(self.prompt, stream=True, **self.request_kwargs)
+                for chunk in response:
+                    # Potongan terakhir membawa usage_metadata (jumlah token) dari API
+                    self.usage = getattr(chunk, "usage_metadata", None) or self.usage
+                    text = chunk.text
+                    if not text:
+                        continue
+                    with self._cond:
+                        if self.first_token_at is None:
+                            self.first_token_at = time.perf_counter()
+                        self.parts.append(text)
+                        self._cond.notify_all()
+            except Exception as e:
+                self.error = e
+            finally:
+                # Lepas slot gate sekarang juga: self.error menyimpan frame ini
+                # (dan `response`), jadi __del__ baru jalan saat job dibuang
+                close = getattr(response, "close", None)
+                if close is not None:
+                    close()
+                response = None
+            finished_at = time.perf_counter()
+
+            if self.error is None and not self.has_text:
+                # Respons kosong tidak disimpan ke cache: dianggap gagal
+                logger.warning("AI stream selesai tanpa teks")
+            elif self.error is None:
+                logger.info(
+                    "AI stream selesai: ttft=%.3fs total=%.3fs",
+                    self.time_to_first_token or 0.0, finished_at - self.started_at
+                )
+                # Sebelum `done`: SingleFlight baru melepas job setelah hasilnya
+                # ada di cache, jadi session lain tidak mengirim request ulang
+                if self.on_complete is not None:
+                    try:
+                        self.on_complete(self.text)
+                    except Exception as e:
+                        logger.warning("hasil AI stream gagal disimpan: %s", e)
+            else:
+                logger.warning("AI stream gagal: %s", self.error)
+        finally:
+            with self._cond:
+                self.finished_at = finished_at or time.perf_counter()
+                self.done = True
+                self._cond.notify_all()
+
+        if self.error is None and TOKEN_REPORT:
+            # Setelah on_complete: count_tokens ikut antre di gate request
+            TOKENS.report(self.model, self.prompt, self.text, self.usage)
+
+    @property
+    def has_text(self):
+        """True jika sudah ada teks selain spasi"""
+        return any(part.strip() for part in self.parts)
+
+    def wait_first_token(self, timeout):
+        """Tunggu maksimal `timeout` detik sampai ada teks atau job selesai"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.parts or self.done, timeout)
+
+    def iter_text(self, idle_timeout=None):
+        """Generator potongan teks dari awal; raise error model jika gagal
+
+        Jika `idle_timeout` diisi, TimeoutError di-raise saat tidak ada potongan
+        baru selama sekian detik.
+        """
+        index = 0
+        while True:
+            with self._cond:
+                arrived = self._cond.wait_for(
+                    lambda: index < len(self.parts) or self.done, idle_timeout
+                )
+                if not arrived:
+                    raise TimeoutError(f"AI tidak mengirim teks selama {idle_timeout:.0f} detik")
+                new_parts = self.parts[index:]
+                index = len(self.parts)
+                finished = self.done
+            yield from new_parts
+            if finished and index >= len(self.parts):
+                break
+        if self.error is not None:
+            raise self.error
+
+
+class SingleFlight:
+    """Registry job yang sedang berjalan, dibagi antar session dalam satu proses"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.started = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def flight_key(prompt, key=None, request_kwargs=None):
+        """Key cache jika ada (prompt dengan key sama dianggap setara), selain itu hash prompt"""
+        base = key or hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        if request_kwargs:
+            base += ":" + json.dumps(request_kwargs, sort_keys=True, default=str)
+        return base
+
+    def start(self, model, prompt, key=None, on_complete=None, request_kwargs=None):
+        """Job yang sedang berjalan untuk prompt ini, atau job baru jika belum ada"""
+        flight_key = self.flight_key(prompt, key, request_kwargs)
+        with self._lock:
+            # Job yang sudah selesai tidak dibagi lagi; hasilnya sudah ada di cache
+            for done_key in [k for k, job in self.jobs.items() if job.done]:
+                del self.jobs[done_key]
+            job = self.jobs.get(flight_key)
+            if job is not None:
+                self.coalesced += 1
+                logger.info("AI request digabung dengan job yang sedang berjalan (%s)", key)
+                return job
+            job = RecommendationStream(
+                model, prompt, key=key, on_complete=on_complete, request_kwargs=request_kwargs
+            )
+            self.jobs[flight_key] = job
+            self.started += 1
+            return job
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": sum(1 for job in self.jobs.values() if not job.done),
+                "started": self.started,
+                "coalesced": self.coalesced,
+            }
+
+
+IN_FLIGHT = SingleFlight()
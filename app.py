@@ -1,11 +1,26 @@
 import streamlit as st
-import matplotlib.pyplot as plt
-import google.generativeai as genai
-import json
 import os
+import math
+import time
 import hashlib
 from datetime import datetime, timedelta, date
 from dotenv import load_dotenv
+from ai_cache import RecommendationCache, recommendation_key
+from ai_stream import IN_FLIGHT
+from ai_client import ModelRouter, create_model
+from ai_cassette import AI_MODE
+from ai_prompt import generation_config
+from ai_budget import DEADLINE_SECONDS, OUTCOMES, await_first_token
+from recommenders import RULES, get_backend
+import coffee_catalog
+from findrisc import QUESTIONS_BY_KEY, option_labels, risk_band, score_answers
+from sugar_stats import add_to_rollup, daily_sugar, weekly_average
+from history_stats import summarize_history
+from history_columns import HistoryColumns
+import charts
+from storage import get_store, init_data_structure
+from metrics import METRICS, start_exporters
+from profiling import profile_rerun, profiling_requested
 
 # -------------------------
 # Konfigurasi Awal
@@ -20,32 +35,39 @@ st.set_page_config(
 # Setup Gemini AI
 load_dotenv()
 
-# Load API Key dari secrets.toml (Streamlit Cloud) atau .env (Local)
-try:
-    # Coba ambil dari st.secrets (prioritas utama)
-    API_KEY = st.secrets.get("GEMINI_API_KEY") or st.secrets.get("GOOGLE_API_KEY")
-except:
-    # Fallback ke environment variable
-    API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+# Tampilkan rekomendasi AI secara streaming (set GLUCOFFEE_AI_STREAM=0 untuk mematikan)
+AI_STREAMING = os.getenv("GLUCOFFEE_AI_STREAM", "1") != "0"
+# Backend rekomendasi: "gemini" (default) atau "rules" (rule engine lokal, tanpa API)
+RECOMMENDER = os.getenv("GLUCOFFEE_RECOMMENDER", "gemini")
 
-if not API_KEY:
-    st.error("API Key tidak ditemukan! Tambahkan GEMINI_API_KEY atau GOOGLE_API_KEY di .streamlit/secrets.toml atau .env")
-    model = None
-else:
-    genai.configure(api_key=API_KEY)
-    
-    # Gunakan Gemini 2.0 Flash (model terbaru dan tercepat)
+def load_api_key():
+    """Load API Key dari secrets.toml (Streamlit Cloud) atau .env (Local)"""
     try:
-        model = genai.GenerativeModel("gemini-2.0-flash-exp")
+        # Coba ambil dari st.secrets (prioritas utama)
+        return st.secrets.get("GEMINI_API_KEY") or st.secrets.get("GOOGLE_API_KEY")
     except:
-        try:
-            model = genai.GenerativeModel("gemini-1.5-flash")
-        except:
-            try:
-                model = genai.GenerativeModel("gemini-pro")
-            except:
-                model = None
-                st.error("Model AI tidak dapat dimuat. Periksa API key Anda.")
+        # Fallback ke environment variable
+        return os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+
+@st.cache_resource
+def load_model(api_key):
+    """Router Gemini bersama untuk semua session: model sehat tercepat, fallback otomatis"""
+    return create_model(api_key)
+
+def get_model():
+    """Model Gemini; SDK baru di-import dan dikonfigurasi saat halaman analisis membutuhkannya"""
+    api_key = load_api_key()
+    # Mode replay menjawab dari cassette, tanpa API key
+    if not api_key and AI_MODE != "replay":
+        st.error("API Key tidak ditemukan! Tambahkan GEMINI_API_KEY atau GOOGLE_API_KEY di .streamlit/secrets.toml atau .env")
+        return None
+    return load_model(api_key)
+
+def get_recommender():
+    """Backend rekomendasi; rule engine lokal jika model Gemini tidak tersedia"""
+    if RECOMMENDER == "rules":
+        return RULES
+    return get_backend(RECOMMENDER, get_model())
 
 # -------------------------
 # User ID Management (Browser-specific)
@@ -61,49 +83,47 @@ def get_browser_id():
     return st.session_state.browser_id
 
 # -------------------------
-# Database JSON Sederhana
+# Database (SQLite, atau JSON dengan GLUCOFFEE_STORAGE=json)
 # -------------------------
 DATA_FOLDER = "glucoffee_users"
-if not os.path.exists(DATA_FOLDER):
-    os.makedirs(DATA_FOLDER)
+os.makedirs(DATA_FOLDER, exist_ok=True)
 
-def get_user_file():
-    """Get data file path untuk user ini"""
-    browser_id = get_browser_id()
-    return os.path.join(DATA_FOLDER, f"user_{browser_id}.json")
+@st.cache_resource
+def get_user_store():
+    """Store data user, dipakai bersama oleh semua session"""
+    return get_store(DATA_FOLDER)
 
-def load_data():
-    """Memuat data dari file JSON"""
-    user_file = get_user_file()
-    if os.path.exists(user_file):
-        try:
-            with open(user_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return init_data_structure()
-    return init_data_structure()
+store = get_user_store()
 
-def init_data_structure():
-    """Struktur data awal"""
-    return {
-        "user_profile": {
-            "name": None,
-            "created_at": None
-        },
-        "findrisc": {
-            "score": None,
-            "risk_level": None,
-            "last_updated": None,
-            "raw_answers": {}
-        },
-        "coffee_history": []
-    }
+@st.cache_resource
+def start_metrics():
+    """Export metrik (file Prometheus / endpoint), sekali per proses"""
+    return start_exporters()
+
+start_metrics()
+
+def load_data():
+    """Memuat data user dari store"""
+    with METRICS.span("load_data"):
+        data = store.load(get_browser_id())
+    return data if data is not None else init_data_structure()
 
 def save_data(data):
-    """Menyimpan data ke file JSON"""
-    user_file = get_user_file()
-    with open(user_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Menyimpan data user ke store"""
+    with METRICS.span("save_data"):
+        store.save(get_browser_id(), data)
+
+def add_coffee_entry(data, entry):
+    """Tambah satu entri kopi ke riwayat dan store"""
+    data['coffee_history'].append(entry)
+    add_to_rollup(data, entry)
+    with METRICS.span("add_coffee"):
+        store.add_coffee(get_browser_id(), data, entry)
+
+@st.cache_resource
+def get_recommendation_cache():
+    """Cache rekomendasi AI, dipakai bersama oleh semua session"""
+    return RecommendationCache(os.path.join(DATA_FOLDER, "ai_cache"))
 
 # Load data
 if 'data' not in st.session_state:
@@ -203,33 +223,40 @@ st.sidebar.caption("- Cek analisis untuk rekomendasi")
 
 def calculate_daily_sugar():
     """Hitung total gula hari ini"""
-    today = date.today().isoformat()
-    total = sum(
-        entry['sugar'] 
-        for entry in data['coffee_history'] 
-        if entry['date'].startswith(today)
-    )
-    return total
+    with METRICS.span("calculate_daily_sugar"):
+        return daily_sugar(data)
 
 def calculate_weekly_average():
     """Hitung rata-rata gula per hari minggu ini"""
-    today = datetime.now()
-    week_ago = today - timedelta(days=7)
-    
-    recent_entries = [
-        entry for entry in data['coffee_history']
-        if datetime.fromisoformat(entry['date']) > week_ago
-    ]
-    
-    if not recent_entries:
-        return 0
-    
-    daily_totals = {}
-    for entry in recent_entries:
-        day = entry['date'].split('T')[0]
-        daily_totals[day] = daily_totals.get(day, 0) + entry['sugar']
-    
-    return sum(daily_totals.values()) / len(daily_totals) if daily_totals else 0
+    with METRICS.span("calculate_weekly_average"):
+        return weekly_average(data)
+
+def get_history_columns():
+    """Versi kolom (NumPy) dari riwayat kopi, dibangun ulang hanya jika riwayat berubah"""
+    columns = st.session_state.get('history_columns')
+    if columns is None or not columns.is_current(data['coffee_history']):
+        METRICS.inc("glucoffee_cache_requests_total", cache="history_columns", result="miss", tier="session")
+        with METRICS.span("history_columns"):
+            columns = HistoryColumns(data['coffee_history'])
+        st.session_state.history_columns = columns
+    else:
+        METRICS.inc("glucoffee_cache_requests_total", cache="history_columns", result="hit", tier="session")
+    return columns
+
+def format_day_entries(entries):
+    """Markdown detail semua entri satu hari, sebagai satu elemen"""
+    blocks = []
+    for i, entry in enumerate(entries, 1):
+        time_str = entry['date'][11:16]
+        topping_str = ", ".join([t.split("(")[0].strip() for t in entry['topping']]) if entry['topping'] else "Tidak ada"
+        blocks.append(
+            f"**#{i} • {time_str}**\n"
+            f"- **Minuman:** {entry['drink']}\n"
+            f"- **Ukuran:** {entry['volume']} × {entry['quantity']} gelas\n"
+            f"- **Topping:** {topping_str}\n"
+            f"- **Gula:** {entry['sugar']:.1f}g"
+        )
+    return "\n\n---\n\n".join(blocks)
 
 def get_findrisc_status():
     """Cek status FINDRISC"""
@@ -244,10 +271,136 @@ def get_findrisc_status():
     else:
         return "valid", f"Valid ({days_ago} hari lalu)"
 
+def start_recommendation_stream(model, cache_key, prompt, hedge=False):
+    """Mulai job streaming AI, atau pakai ulang job session ini untuk key yang sama"""
+    state_key = 'ai_hedge_job' if hedge else 'ai_job'
+    job = st.session_state.get(state_key)
+    if job is not None and job.key == cache_key and job.error is None:
+        return job
+    
+    cache = get_recommendation_cache()
+    request_kwargs = {"generation_config": generation_config("analysis")}
+    if hedge and isinstance(model, ModelRouter):
+        # Hedged request diarahkan ke model selain yang tercepat
+        request_kwargs["skip_fastest"] = True
+    # Session lain dengan key yang sama yang sedang menunggu AI ikut membaca job yang sama
+    job = IN_FLIGHT.start(
+        model,
+        prompt,
+        key=cache_key,
+        on_complete=lambda text: cache.put(cache_key, text),
+        request_kwargs=request_kwargs
+    )
+    st.session_state[state_key] = job
+    return job
+
+def get_history_summary(columns, since_day, sort_order):
+    """Statistik riwayat untuk filter aktif; dihitung ulang hanya jika riwayat atau filter berubah"""
+    key = (since_day, sort_order)
+    cached = st.session_state.get('history_summary')
+    if cached is not None and cached[0] is columns and cached[1] == key:
+        return cached[2]
+    with METRICS.span("history_summary"):
+        stats = summarize_history(columns, since_day, sort_order)
+    st.session_state.history_summary = (columns, key, stats)
+    return stats
+
+@st.fragment
+def render_history_section():
+    """Section Riwayat Konsumsi di halaman Hasil Analisis
+
+    Fragment: mengubah filter, halaman, atau toggle detail hanya menjalankan
+    ulang fungsi ini, bukan seluruh script (CSS, sidebar, chart, dan AI).
+    """
+    st.subheader("Riwayat Konsumsi")
+    
+    # Filter options
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        period = st.selectbox(
+            "Periode:",
+            ["7 Hari Terakhir", "30 Hari Terakhir", "Semua Waktu"]
+        )
+    
+    with col2:
+        sort_order = st.selectbox(
+            "Urutan:",
+            ["Terbaru", "Terlama", "Gula Tertinggi"]
+        )
+    
+    # Filter per hari kalender (hari ini + N-1 hari sebelumnya)
+    period_days = {"7 Hari Terakhir": 7, "30 Hari Terakhir": 30}.get(period)
+    since_day = None
+    if period_days:
+        since_day = (date.today() - timedelta(days=period_days - 1)).isoformat()
+    
+    # Filter, urutkan, hitung statistik, dan kelompokkan per hari sebagai operasi array
+    columns = get_history_columns()
+    stats = get_history_summary(columns, since_day, sort_order)
+    
+    # Statistics
+    if stats['total_entries']:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Total Entri", stats['total_entries'])
+        col2.metric("Total Gula", f"{stats['total_sugar']:.1f}g")
+        col3.metric("Rata-rata/Hari", f"{stats['avg_per_day']:.1f}g")
+        col4.metric("Hari Aktif", stats['unique_days'])
+        
+        if stats['days_over_limit'] > 0:
+            st.warning(f"**{stats['days_over_limit']} hari** melebihi batas aman dalam periode ini")
+    
+    st.markdown("---")
+    
+    # Display grouped entries (per halaman; detail hari dibangun hanya saat dibuka)
+    if stats['total_entries']:
+        grouped = stats['grouped']
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            days_per_page = st.selectbox(
+                "Hari per halaman:",
+                [7, 14, 30],
+                key="history_page_size"
+            )
+        total_pages = max(1, math.ceil(len(grouped) / days_per_page))
+        with col2:
+            # Key ikut filter supaya halaman kembali ke 1 saat filter berubah
+            page = st.number_input(
+                f"Halaman (dari {total_pages}):",
+                min_value=1,
+                max_value=total_pages,
+                value=1,
+                key=f"history_page_{period}_{sort_order}_{days_per_page}"
+            )
+        
+        start = (page - 1) * days_per_page
+        visible_days = grouped[start:start + days_per_page]
+        st.caption(f"Menampilkan hari {start + 1}–{start + len(visible_days)} dari {len(grouped)} hari")
+        
+        for day, day_index, day_total in visible_days:
+            date_obj = datetime.fromisoformat(day)
+            day_name = date_obj.strftime("%A, %d %B %Y")
+            
+            if day_total > 50:
+                status = "Melebihi Batas"
+            elif day_total > 40:
+                status = "Mendekati Batas"
+            else:
+                status = "Aman"
+            
+            with st.container(border=True):
+                st.markdown(f"**{day_name}** • {len(day_index)} entri • {day_total:.1f}g • {status}")
+                if st.toggle("Lihat detail", key=f"history_detail_{day}"):
+                    st.markdown(format_day_entries(columns.records(day_index)))
+    else:
+        st.info("Tidak ada data untuk periode yang dipilih")
+
 # -------------------------
 # PAGE: HOME
 # -------------------------
-if st.session_state.active_page == "home":
+def render_home():
+    """Halaman Home: setup profil dan ringkasan hari ini"""
     st.title("☕ GluCoffee")
     st.subheader("Kesadaran Diabetes Dimulai dari Secangkir Kopi")
     
@@ -320,6 +473,7 @@ if st.session_state.active_page == "home":
             st.caption(f"Browser ID: {get_browser_id()}")
             if st.button("Reset Semua Data"):
                 if st.checkbox("Saya yakin ingin menghapus semua data"):
+                    store.reset_history(get_browser_id())
                     st.session_state.data = init_data_structure()
                     save_data(st.session_state.data)
                     st.success("Data berhasil direset!")
@@ -362,7 +516,8 @@ if st.session_state.active_page == "home":
 # -------------------------
 # PAGE: TES FINDRISC
 # -------------------------
-elif st.session_state.active_page == "findrisc":
+def render_findrisc():
+    """Halaman Tes FINDRISC"""
     st.title("Tes Risiko Diabetes (FINDRISC)")
     
     if not data['user_profile']['name']:
@@ -400,149 +555,76 @@ elif st.session_state.active_page == "findrisc":
             st.markdown("#### Data Demografis")
             
             usia = st.selectbox(
-                "1. Usia Anda:",
-                ["Di bawah 45 tahun (0 poin)", 
-                 "45–54 tahun (2 poin)", 
-                 "55–64 tahun (3 poin)", 
-                 "Di atas 64 tahun (4 poin)"]
+                QUESTIONS_BY_KEY["usia"].label,
+                option_labels("usia")
             )
             
             bmi = st.selectbox(
-                "2. Indeks Massa Tubuh (BMI):",
-                ["Di bawah 25 kg/m² (0 poin)", 
-                 "25–30 kg/m² (1 poin)", 
-                 "Di atas 30 kg/m² (3 poin)"]
+                QUESTIONS_BY_KEY["bmi"].label,
+                option_labels("bmi")
             )
             st.caption("BMI = Berat (kg) / Tinggi² (m)")
             
             lingkar_perut = st.selectbox(
-                "3. Lingkar Perut:",
-                ["Pria <94 cm / Wanita <80 cm (0 poin)",
-                 "Pria 94–102 cm / Wanita 80–88 cm (3 poin)",
-                 "Pria >102 cm / Wanita >88 cm (4 poin)"]
+                QUESTIONS_BY_KEY["lingkar_perut"].label,
+                option_labels("lingkar_perut")
             )
             
             aktifitas = st.selectbox(
-                "4. Apakah Anda berolahraga minimal 30 menit setiap hari?",
-                ["Ya (0 poin)", "Tidak (2 poin)"]
+                QUESTIONS_BY_KEY["aktifitas"].label,
+                option_labels("aktifitas")
             )
         
         with col2:
             st.markdown("#### Gaya Hidup & Riwayat")
             
             makan_sayur = st.selectbox(
-                "5. Seberapa sering Anda makan sayur atau buah?",
-                ["Setiap hari (0 poin)", "Tidak setiap hari (1 poin)"]
+                QUESTIONS_BY_KEY["makan_sayur"].label,
+                option_labels("makan_sayur")
             )
             
             obat_hipertensi = st.selectbox(
-                "6. Pernahkah Anda minum obat antihipertensi secara rutin?",
-                ["Tidak (0 poin)", "Ya (2 poin)"]
+                QUESTIONS_BY_KEY["obat_hipertensi"].label,
+                option_labels("obat_hipertensi")
             )
             
             pernah_gula_tinggi = st.selectbox(
-                "7. Pernahkah Anda ditemukan memiliki kadar gula darah tinggi?",
-                ["Tidak (0 poin)", "Ya (5 poin)"]
+                QUESTIONS_BY_KEY["pernah_gula_tinggi"].label,
+                option_labels("pernah_gula_tinggi")
             )
             st.caption("(Saat medical check-up, kehamilan, atau sakit)")
             
             keluarga_dm = st.selectbox(
-                "8. Apakah ada anggota keluarga yang menderita diabetes?",
-                ["Tidak (0 poin)",
-                 "Ya: Kakek/nenek, paman/bibi, sepupu (3 poin)",
-                 "Ya: Orang tua, saudara kandung, anak (5 poin)"]
+                QUESTIONS_BY_KEY["keluarga_dm"].label,
+                option_labels("keluarga_dm")
             )
         
         st.markdown("---")
         submitted = st.form_submit_button("Hitung & Simpan Hasil", use_container_width=True)
         
         if submitted:
-            # Mapping skor - Fixed logic
-            skor = 0
-            
-            # Usia
-            if "Di bawah 45" in usia:
-                skor += 0
-            elif "45" in usia and "54" in usia:
-                skor += 2
-            elif "55" in usia and "64" in usia:
-                skor += 3
-            elif "Di atas 64" in usia:
-                skor += 4
-            
-            # BMI
-            if "Di bawah 25" in bmi:
-                skor += 0
-            elif "25" in bmi and "30" in bmi:
-                skor += 1
-            elif "Di atas 30" in bmi:
-                skor += 3
-            
-            # Lingkar Perut
-            if "<94" in lingkar_perut or "<80" in lingkar_perut:
-                skor += 0
-            elif "94" in lingkar_perut and "102" in lingkar_perut:
-                skor += 3
-            elif ">102" in lingkar_perut or ">88" in lingkar_perut:
-                skor += 4
-            
-            # Aktivitas
-            skor += 0 if "Ya" in aktifitas else 2
-            
-            # Makan Sayur
-            skor += 0 if "Setiap hari" in makan_sayur else 1
-            
-            # Obat Hipertensi
-            skor += 0 if "Tidak" in obat_hipertensi else 2
-            
-            # Gula Tinggi
-            skor += 0 if "Tidak" in pernah_gula_tinggi else 5
-            
-            # Keluarga DM
-            if "Tidak" in keluarga_dm:
-                skor += 0
-            elif "Kakek" in keluarga_dm:
-                skor += 3
-            elif "Orang tua" in keluarga_dm:
-                skor += 5
-            
-            # Klasifikasi risiko
-            if skor < 7:
-                risiko = "Rendah"
-                penjelasan = "1 dari 100 orang akan mengembangkan diabetes dalam 10 tahun"
-                warna = "success"
-            elif skor < 12:
-                risiko = "Sedikit Meningkat"
-                penjelasan = "1 dari 25 orang akan mengembangkan diabetes dalam 10 tahun"
-                warna = "info"
-            elif skor < 15:
-                risiko = "Sedang"
-                penjelasan = "1 dari 6 orang akan mengembangkan diabetes dalam 10 tahun"
-                warna = "warning"
-            elif skor < 20:
-                risiko = "Tinggi"
-                penjelasan = "1 dari 3 orang akan mengembangkan diabetes dalam 10 tahun"
-                warna = "warning"
-            else:
-                risiko = "Sangat Tinggi"
-                penjelasan = "1 dari 2 orang akan mengembangkan diabetes dalam 10 tahun"
-                warna = "error"
+            raw_answers = {
+                "usia": usia,
+                "bmi": bmi,
+                "lingkar_perut": lingkar_perut,
+                "aktifitas": aktifitas,
+                "makan_sayur": makan_sayur,
+                "obat_hipertensi": obat_hipertensi,
+                "pernah_gula_tinggi": pernah_gula_tinggi,
+                "keluarga_dm": keluarga_dm
+            }
+            skor = score_answers(raw_answers)
+            band = risk_band(skor)
+            risiko = band.level
+            penjelasan = band.description
+            warna = band.tone
             
             # Simpan data
             data['findrisc'] = {
                 "score": skor,
                 "risk_level": risiko,
                 "last_updated": datetime.now().isoformat(),
-                "raw_answers": {
-                    "usia": usia,
-                    "bmi": bmi,
-                    "lingkar_perut": lingkar_perut,
-                    "aktifitas": aktifitas,
-                    "makan_sayur": makan_sayur,
-                    "obat_hipertensi": obat_hipertensi,
-                    "pernah_gula_tinggi": pernah_gula_tinggi,
-                    "keluarga_dm": keluarga_dm
-                }
+                "raw_answers": raw_answers
             }
             save_data(data)
             
@@ -572,7 +654,8 @@ elif st.session_state.active_page == "findrisc":
 # -------------------------
 # PAGE: KONSUMSI KOPI
 # -------------------------
-elif st.session_state.active_page == "coffee":
+def render_coffee():
+    """Halaman Konsumsi Kopi"""
     st.title("Catat Konsumsi Kopi Harian")
     
     if not data['user_profile']['name']:
@@ -591,25 +674,14 @@ elif st.session_state.active_page == "coffee":
     elif today_sugar > 40:
         st.warning("Mendekati batas!")
     
-    st.markdown("---")
+    # Kombinasi terendah gula yang masih muat, langsung dari index katalog
+    sisa_kuota = max(0, 50 - today_sugar)
+    with st.expander(f"Pilihan rendah gula untuk sisa kuota {sisa_kuota:.1f}g"):
+        for combo in coffee_catalog.low_sugar_options(sisa_kuota):
+            topping_str = ", ".join(t.split("(")[0].strip() for t in combo.toppings) or "tanpa topping"
+            st.markdown(f"- **{combo.drink}** • {combo.size} • {topping_str}: **{combo.sugar:.1f}g**")
     
-    coffee_database = {
-        "Kopi Kenangan Mantan": 16.0,
-        "Kopi Susu": 9.5,
-        "Kopi Susu Black Aren": 14.0,
-        "Salted Caramel Macchiato": 28.0,
-        "Caffe Latte": 31.5,
-        "Matcha Latte": 17.5,
-        "Butterscotch Latte": 24.4,
-        "Americano": 0.0,
-        "Doubleshot Espresso Latte": 25.5,
-        "Vanilla Latte": 25.7,
-        "Caffe Mocha": 25.7,
-        "Aren Latte": 21.0,
-        "Iced Buttercream Latte": 31.5,
-        "Soy Matcha Latte": 36.8,
-        "Cappuccino": 13.6
-    }
+    st.markdown("---")
     
     with st.form("coffee_form"):
         st.subheader("Detail Konsumsi Kopi")
@@ -619,10 +691,10 @@ elif st.session_state.active_page == "coffee":
         with col1:
             coffee_type = st.selectbox(
                 "Jenis Kopi:",
-                options=list(coffee_database.keys())
+                options=list(coffee_catalog.COFFEE_DATABASE.keys())
             )
             
-            base_sugar = coffee_database[coffee_type]
+            base_sugar = coffee_catalog.COFFEE_DATABASE[coffee_type]
             if base_sugar == 0:
                 st.info("Americano tidak mengandung gula tambahan!")
             else:
@@ -630,7 +702,7 @@ elif st.session_state.active_page == "coffee":
             
             volume = st.radio(
                 "Ukuran Gelas:",
-                ["Reguler (≈350ml)", "Large (≈473ml)"],
+                list(coffee_catalog.SIZES),
                 horizontal=True
             )
         
@@ -644,25 +716,19 @@ elif st.session_state.active_page == "coffee":
             
             topping = st.multiselect(
                 "Topping Tambahan:",
-                ["Nata De Coco (+5g)", 
-                 "Salted Caramel (+5g)", 
-                 "Whipped Cream (+5g)", 
-                 "Brown Sugar Jelly (+5g)", 
-                 "Oatmilk (+3g)",
-                 "Extra Shot Espresso (+0g)"]
+                list(coffee_catalog.TOPPINGS)
             )
         
-        volume_multiplier = 1.0 if "Reguler" in volume else 1.35
-        sugar_per_cup = base_sugar * volume_multiplier
-        topping_sugar = len(topping) * 5
-        total_sugar = (sugar_per_cup * quantity) + topping_sugar
+        sugar_per_cup = coffee_catalog.cup_sugar(coffee_type, volume)
+        topping_sugar = coffee_catalog.topping_sugar(topping)
+        total_sugar = coffee_catalog.entry_sugar(coffee_type, volume, quantity, topping)
         
         st.markdown("---")
         st.markdown("### Estimasi Total")
         
         col1, col2, col3 = st.columns(3)
         col1.metric("Per Gelas", f"{sugar_per_cup:.1f}g")
-        col2.metric("Topping", f"{topping_sugar}g")
+        col2.metric("Topping", f"{topping_sugar:g}g")
         col3.metric("TOTAL", f"{total_sugar:.1f}g")
         
         submitted = st.form_submit_button("Simpan Konsumsi", use_container_width=True)
@@ -677,8 +743,7 @@ elif st.session_state.active_page == "coffee":
                 "sugar": total_sugar
             }
             
-            data['coffee_history'].append(entry)
-            save_data(data)
+            add_coffee_entry(data, entry)
             
             st.success(f"Konsumsi kopi berhasil dicatat! Total gula: **{total_sugar:.1f}g**")
             st.balloons()
@@ -692,10 +757,8 @@ elif st.session_state.active_page == "coffee":
         st.markdown("---")
         st.subheader("Riwayat Konsumsi Hari Ini")
         
-        today_entries = [
-            entry for entry in data['coffee_history']
-            if entry['date'].startswith(date.today().isoformat())
-        ]
+        columns = get_history_columns()
+        today_entries = columns.records(columns.since(date.today().isoformat()))
         
         if today_entries:
             for i, entry in enumerate(reversed(today_entries), 1):
@@ -714,7 +777,8 @@ elif st.session_state.active_page == "coffee":
 # -------------------------
 # PAGE: HASIL ANALISIS
 # -------------------------
-elif st.session_state.active_page == "analysis":
+def render_analysis():
+    """Halaman Hasil Analisis"""
     st.title("Hasil Analisis Kesehatan Anda")
     
     if not data['user_profile']['name']:
@@ -738,6 +802,23 @@ elif st.session_state.active_page == "analysis":
     if not has_coffee:
         st.warning("Anda belum mencatat konsumsi kopi. Tambahkan data di Konsumsi Kopi.")
     
+    backend = get_recommender()
+    today_sugar = calculate_daily_sugar() if has_coffee else 0
+    weekly_avg = calculate_weekly_average() if has_coffee else 0
+    
+    # Kirim request AI lebih awal supaya section lain tampil selagi menunggu
+    recommendation = None
+    ai_job = None
+    if has_findrisc or has_coffee:
+        ai_started = time.perf_counter()
+        if backend.remote:
+            cache = get_recommendation_cache()
+            cache_key = recommendation_key(data, today_sugar, weekly_avg)
+            prompt = backend.prompt(data, today_sugar, weekly_avg)
+            recommendation = cache.get(cache_key)
+            if recommendation is None:
+                ai_job = start_recommendation_stream(backend.model, cache_key, prompt)
+    
     st.markdown("---")
     
     # Section 1: Data FINDRISC
@@ -755,16 +836,15 @@ elif st.session_state.active_page == "analysis":
         col2.metric("Tingkat Risiko", risk)
         col3.metric("Terakhir Diisi", f"{days_ago} hari lalu")
         
-        if score < 7:
-            st.success("**Risiko Rendah** - Pertahankan gaya hidup sehat!")
-        elif score < 12:
-            st.info("**Risiko Sedikit Meningkat** - Perhatikan pola makan")
-        elif score < 15:
-            st.warning("**Risiko Sedang** - Konsultasi dengan dokter")
-        elif score < 20:
-            st.warning("**Risiko Tinggi** - Pemeriksaan gula darah disarankan")
+        band = risk_band(score)
+        if band.tone == "success":
+            st.success(f"**Risiko {band.level}** - {band.advice}")
+        elif band.tone == "info":
+            st.info(f"**Risiko {band.level}** - {band.advice}")
+        elif band.tone == "warning":
+            st.warning(f"**Risiko {band.level}** - {band.advice}")
         else:
-            st.error("**Risiko Sangat Tinggi** - Segera konsultasi dokter")
+            st.error(f"**Risiko {band.level}** - {band.advice}")
     
     st.markdown("---")
     
@@ -772,9 +852,6 @@ elif st.session_state.active_page == "analysis":
     if has_coffee:
         st.subheader("Analisis Konsumsi Gula dari Kopi")
         
-        today_sugar = calculate_daily_sugar()
-        weekly_avg = calculate_weekly_average()
-        
         col1, col2, col3, col4 = st.columns(4)
         col1.metric("Gula Hari Ini", f"{today_sugar:.1f}g")
         col2.metric("Batas WHO", "50g/hari")
@@ -784,41 +861,12 @@ elif st.session_state.active_page == "analysis":
         # Visualisasi Pie Chart
         st.markdown("#### Visualisasi Kuota Harian")
         
-        fig, ax = plt.subplots(figsize=(8, 6))
-        
-        if today_sugar > 0:
-            if today_sugar > 50:
-                sizes = [50, today_sugar - 50]
-                labels = [f'Batas Aman (50g)', f'Kelebihan ({today_sugar - 50:.1f}g)']
-                colors = ['#ff6b6b', '#ee5a6f']
-                explode = (0, 0.1)
+        with METRICS.span("chart", mode=charts.CHART_MODE):
+            if charts.CHART_MODE == "native":
+                st.vega_lite_chart(charts.quota_chart_spec(today_sugar), use_container_width=True)
             else:
-                sisa = 50 - today_sugar
-                sizes = [today_sugar, sisa]
-                labels = [f'Terpakai ({today_sugar:.1f}g)', f'Sisa ({sisa:.1f}g)']
-                colors = ['#ffd93d', '#6bcf7f']
-                explode = (0.05, 0)
-            
-            wedges, texts, autotexts = ax.pie(
-                sizes, 
-                labels=labels, 
-                autopct='%1.1f%%',
-                startangle=90, 
-                colors=colors,
-                explode=explode,
-                textprops={'fontsize': 12, 'weight': 'bold'}
-            )
-            
-            for autotext in autotexts:
-                autotext.set_color('white')
-        else:
-            sizes = [100]
-            labels = ['Belum ada konsumsi (0g)']
-            colors = ['#e0e0e0']
-            ax.pie(sizes, labels=labels, colors=colors, startangle=90)
-        
-        ax.axis('equal')
-        st.pyplot(fig)
+                # PNG di-cache per nilai gula; figure matplotlib tidak menumpuk antar rerun
+                st.image(charts.quota_chart_png(today_sugar), width="stretch")
         
         if today_sugar > 50:
             st.error(f"**PERINGATAN!** Anda telah mengonsumsi **{today_sugar:.1f}g** gula, "
@@ -832,167 +880,68 @@ elif st.session_state.active_page == "analysis":
     
     # Section 3: Riwayat Konsumsi
     if has_coffee:
-        st.subheader("Riwayat Konsumsi")
-        
-        # Filter options
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            period = st.selectbox(
-                "Periode:",
-                ["7 Hari Terakhir", "30 Hari Terakhir", "Semua Waktu"]
-            )
-        
-        with col2:
-            sort_order = st.selectbox(
-                "Urutan:",
-                ["Terbaru", "Terlama", "Gula Tertinggi"]
-            )
-        
-        # Filter data
-        filtered_history = data['coffee_history'].copy()
-        
-        if period == "7 Hari Terakhir":
-            cutoff = datetime.now() - timedelta(days=7)
-            filtered_history = [e for e in filtered_history if datetime.fromisoformat(e['date']) > cutoff]
-        elif period == "30 Hari Terakhir":
-            cutoff = datetime.now() - timedelta(days=30)
-            filtered_history = [e for e in filtered_history if datetime.fromisoformat(e['date']) > cutoff]
-        
-        # Sort
-        if sort_order == "Terbaru":
-            filtered_history.sort(key=lambda x: x['date'], reverse=True)
-        elif sort_order == "Terlama":
-            filtered_history.sort(key=lambda x: x['date'])
-        elif sort_order == "Gula Tertinggi":
-            filtered_history.sort(key=lambda x: x['sugar'], reverse=True)
-        
-        # Statistics
-        if filtered_history:
-            total_entries = len(filtered_history)
-            total_sugar = sum(e['sugar'] for e in filtered_history)
-            unique_days = len(set(e['date'].split('T')[0] for e in filtered_history))
-            avg_per_day = total_sugar / unique_days if unique_days > 0 else 0
-            
-            col1, col2, col3, col4 = st.columns(4)
-            col1.metric("Total Entri", total_entries)
-            col2.metric("Total Gula", f"{total_sugar:.1f}g")
-            col3.metric("Rata-rata/Hari", f"{avg_per_day:.1f}g")
-            col4.metric("Hari Aktif", unique_days)
-            
-            days_over_limit = sum(1 for day in set(e['date'].split('T')[0] for e in filtered_history)
-                                if sum(e['sugar'] for e in filtered_history if e['date'].startswith(day)) > 50)
-            
-            if days_over_limit > 0:
-                st.warning(f"**{days_over_limit} hari** melebihi batas aman dalam periode ini")
-        
-        st.markdown("---")
-        
-        # Display grouped entries
-        if filtered_history:
-            grouped = {}
-            for entry in filtered_history:
-                day = entry['date'].split('T')[0]
-                if day not in grouped:
-                    grouped[day] = []
-                grouped[day].append(entry)
-            
-            for day in sorted(grouped.keys(), reverse=(sort_order=="Terbaru")):
-                day_entries = grouped[day]
-                day_total = sum(e['sugar'] for e in day_entries)
-                
-                date_obj = datetime.fromisoformat(day)
-                day_name = date_obj.strftime("%A, %d %B %Y")
-                
-                if day_total > 50:
-                    status = "Melebihi Batas"
-                elif day_total > 40:
-                    status = "Mendekati Batas"
-                else:
-                    status = "Aman"
-                
-                with st.expander(f"**{day_name}** • {len(day_entries)} entri • {day_total:.1f}g • {status}"):
-                    for i, entry in enumerate(day_entries, 1):
-                        time_str = datetime.fromisoformat(entry['date']).strftime("%H:%M")
-                        topping_str = ", ".join([t.split("(")[0].strip() for t in entry['topping']]) if entry['topping'] else "Tidak ada"
-                        
-                        st.markdown(f"""
-                        **#{i} • {time_str}**
-                        - **Minuman:** {entry['drink']}
-                        - **Ukuran:** {entry['volume']} × {entry['quantity']} gelas
-                        - **Topping:** {topping_str}
-                        - **Gula:** {entry['sugar']:.1f}g
-                        """)
-                        
-                        if i < len(day_entries):
-                            st.markdown("---")
-        else:
-            st.info("Tidak ada data untuk periode yang dipilih")
+        render_history_section()
     
     st.markdown("---")
     
     # Section 4: AI Analysis
-    if model and (has_findrisc or has_coffee):
+    if has_findrisc or has_coffee:
         st.subheader("Rekomendasi Personal dari AI")
         
-        with st.spinner("AI sedang menganalisis data Anda..."):
-            prompt = f"""
-Anda adalah GluCoffee AI Assistant, ahli nutrisi dan diabetes educator.
-
-PROFIL PENGGUNA: {data['user_profile']['name']}
-
-DATA KESEHATAN:
-"""
-            
-            if has_findrisc:
-                prompt += f"""
-- Skor FINDRISC: {data['findrisc']['score']} poin
-- Tingkat Risiko: {data['findrisc']['risk_level']}
-- Usia: {data['findrisc']['raw_answers'].get('usia', 'N/A')}
-- BMI: {data['findrisc']['raw_answers'].get('bmi', 'N/A')}
-"""
+        outcome = "cache"
+        try:
+            if not backend.remote:
+                recommendation = backend.recommend(data, today_sugar, weekly_avg)
+                outcome = backend.name
+            elif recommendation is None:
+                # Tunggu teks pertama dalam batas waktu; hedge ke model lain jika lambat
+                with st.spinner("AI sedang menganalisis data Anda..."):
+                    ai_job, outcome = await_first_token(
+                        ai_job,
+                        lambda: start_recommendation_stream(backend.model, cache_key, prompt, hedge=True)
+                    )
+                if ai_job is None:
+                    recommendation = cache.get(cache_key, allow_stale=True)
+                    outcome = "stale-cache"
+                    if recommendation is None:
+                        recommendation = RULES.recommend(data, today_sugar, weekly_avg)
+                        outcome = "fallback"
+            
+            # Waktu sampai teks pertama siap ditampilkan; dicatat setelah teks
+            # selesai dibaca supaya satu request tidak tercatat juga sebagai "error"
+            first_text_seconds = time.perf_counter() - ai_started
             
-            if has_coffee:
-                prompt += f"""
-- Konsumsi Gula Hari Ini: {today_sugar:.1f} gram
-- Rata-rata Mingguan: {weekly_avg:.1f} gram/hari
-- Sisa Kuota Hari Ini: {max(0, 50-today_sugar):.1f} gram
-"""
+            st.markdown("""
+            <div style='background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
+                        padding: 20px; border-radius: 15px; color: white; margin: 20px 0;'>
+                <h3 style='color: white; margin-top: 0;'>Pesan dari AI</h3>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            if outcome in ("stale-cache", "fallback"):
+                st.info("AI sedang lambat merespons. Menampilkan rekomendasi sementara.")
+            elif outcome == RULES.name and RECOMMENDER != "rules":
+                st.info("Model AI tidak dapat dimuat. Menampilkan rekomendasi dari aturan lokal GluCoffee.")
+            
+            if recommendation is not None:
+                st.markdown(recommendation)
+            elif AI_STREAMING:
+                # Render potongan teks begitu tiba dari thread background
+                st.write_stream(ai_job.iter_text(idle_timeout=DEADLINE_SECONDS))
+            else:
+                with st.spinner("AI sedang menganalisis data Anda..."):
+                    text = "".join(ai_job.iter_text(idle_timeout=DEADLINE_SECONDS))
+                st.markdown(text)
+            OUTCOMES.record(outcome, first_text_seconds)
             
-            prompt += """
-
-TUGAS:
-1. Sapaan hangat dengan nama
-2. Analisis hubungan FINDRISC dengan pola konsumsi gula
-3. Rekomendasi meal plan hari ini berdasarkan sisa kuota
-4. Tips memilih kopi lebih sehat
-5. Action plan 3 hari ke depan
-6. Motivasi penutup
-
-Gunakan bahasa Indonesia, maksimal 500 kata, dengan emoji.
-"""
+            st.markdown("---")
+            st.caption("**Disclaimer:** Rekomendasi AI bersifat edukatif, bukan pengganti konsultasi medis.")
             
-            try:
-                response = model.generate_content(prompt)
-                
-                st.markdown("""
-                <div style='background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
-                            padding: 20px; border-radius: 15px; color: white; margin: 20px 0;'>
-                    <h3 style='color: white; margin-top: 0;'>Pesan dari AI</h3>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                st.markdown(response.text)
-                
-                st.markdown("---")
-                st.caption("**Disclaimer:** Rekomendasi AI bersifat edukatif, bukan pengganti konsultasi medis.")
-                
-            except Exception as e:
-                st.error(f"Terjadi kesalahan saat menghubungi AI: {str(e)}")
-                st.info("Pastikan API key valid. Coba gunakan model 'gemini-pro' jika 'gemini-2.0-flash-exp' tidak tersedia.")
-    
-    elif not model:
-        st.error("Model AI tidak dapat dimuat. Periksa API key Anda.")
+        except Exception as e:
+            OUTCOMES.record("error", time.perf_counter() - ai_started)
+            st.error(f"Terjadi kesalahan saat menghubungi AI: {str(e)}")
+            st.info("Sementara itu, berikut rekomendasi dari aturan lokal GluCoffee:")
+            st.markdown(RULES.recommend(data, today_sugar, weekly_avg))
     
     st.markdown("---")
     
@@ -1016,6 +965,24 @@ Gunakan bahasa Indonesia, maksimal 500 kata, dengan emoji.
             st.session_state.active_page = "home"
             st.rerun()
 
+# -------------------------
+# Dispatch halaman
+# -------------------------
+PAGES = {
+    "home": render_home,
+    "findrisc": render_findrisc,
+    "coffee": render_coffee,
+    "analysis": render_analysis,
+}
+
+active_page = st.session_state.active_page
+if active_page in PAGES:
+    # Profiling opt-in: GLUCOFFEE_PROFILE=1 atau ?profile=<token admin>
+    profile = profiling_requested(st.query_params.get("profile"))
+    with profile_rerun(active_page, len(data['coffee_history']), enabled=profile), \
+            METRICS.span("page", page=active_page):
+        PAGES[active_page]()
+
 # -------------------------
 # Footer
 # -------------------------
@@ -0,0 +1,247 @@
+"""Benchmark render per halaman dengan riwayat kopi sintetis yang besar.
+
+Untuk setiap ukuran riwayat (default 100, 10k, dan 100k entri) dijalankan satu
+proses Python baru yang menyiapkan dokumen user sintetis di folder sementara,
+lalu mengukur satu run penuh app.py lewat Streamlit AppTest untuk:
+
+- setiap halaman (home, findrisc, coffee, analysis)
+- setiap kombinasi filter riwayat di halaman analysis (periode × urutan)
+- submit form FINDRISC dan form kopi (jalur save_data / add_coffee)
+
+    python benchmarks/bench_pages.py
+    python benchmarks/bench_pages.py --sizes 100 10000 --repeat 5 --json hasil.json
+
+Model Gemini diganti stub sehingga angka yang terukur adalah kerja app.py
+sendiri (statistik, pengelompokan riwayat, penyimpanan), tanpa jaringan.
+Hasil ditulis ke file JSON supaya bisa dibandingkan antar commit.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = [100, 10_000, 100_000]
+PAGES = ["home", "findrisc", "coffee", "analysis"]
+PERIODS = ["7 Hari Terakhir", "30 Hari Terakhir", "Semua Waktu"]
+SORT_ORDERS = ["Terbaru", "Terlama", "Gula Tertinggi"]
+USER_ID = "bench"
+
+
+def synthetic_document(size, seed=0):
+    """Dokumen user dengan `size` entri kopi acak (deterministik per seed)"""
+    import coffee_catalog
+    from findrisc import QUESTION_KEYS, option_labels, risk_band, score_answers
+    from storage import init_data_structure
+    from sugar_stats import rebuild_rollups
+
+    rng = random.Random(seed)
+    drinks = list(coffee_catalog.COFFEE_DATABASE)
+    sizes = list(coffee_catalog.SIZES)
+    toppings = list(coffee_catalog.TOPPINGS)
+    now = datetime.now()
+    # Maksimal 3 tahun ke belakang; riwayat besar berarti lebih banyak entri per hari
+    span_seconds = min(max(size // 3, 1), 3 * 365) * 86400
+
+    history = []
+    for offset in sorted((rng.randrange(span_seconds) for _ in range(size)), reverse=True):
+        drink = rng.choice(drinks)
+        volume = rng.choice(sizes)
+        quantity = rng.choice([1, 1, 1, 2])
+        topping = rng.sample(toppings, rng.choice([0, 0, 1, 2]))
+        history.append({
+            "date": (now - timedelta(seconds=offset)).isoformat(),
+            "drink": drink,
+            "volume": volume,
+            "quantity": quantity,
+            "topping": topping,
+            "sugar": coffee_catalog.entry_sugar(drink, volume, quantity, topping),
+        })
+
+    answers = {key: rng.choice(option_labels(key)) for key in QUESTION_KEYS}
+    score = score_answers(answers)
+    data = init_data_structure()
+    data['user_profile'] = {"name": "Benchmark", "created_at": now.isoformat()}
+    data['findrisc'] = {
+        "score": score,
+        "risk_level": risk_band(score).level,
+        "last_updated": now.isoformat(),
+        "raw_answers": answers,
+    }
+    data['coffee_history'] = history
+    rebuild_rollups(data)
+    return data
+
+
+def _install_stub_model():
+    class StubResponse:
+        text = "Rekomendasi benchmark."
+
+        def __iter__(self):
+            yield self
+
+    class StubModel:
+        def generate_content(self, prompt, stream=False, **kwargs):
+            return StubResponse()
+
+        def count_tokens(self, contents):
+            return None
+
+    import ai_client
+    ai_client.create_model = lambda api_key, **kwargs: StubModel()
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+
+def _app_test(page):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=600)
+    at.session_state["browser_id"] = USER_ID
+    at.session_state["active_page"] = page
+    return at
+
+
+def _timed_run(at):
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return elapsed
+
+
+def _select(at, label, value):
+    next(widget for widget in at.selectbox if widget.label == label).select(value)
+
+
+def _click(at, text):
+    next(button for button in at.button if text in button.label).click()
+
+
+def bench_page(page, repeat):
+    """Run pertama (sesi baru) dan run ulang di sesi yang sama"""
+    at = _app_test(page)
+    first = _timed_run(at)
+    return {"first": first, "runs": [_timed_run(at) for _ in range(repeat)]}
+
+
+def bench_analysis_filter(period, sort_order, repeat):
+    """Rerun setelah filter riwayat diubah, seperti interaksi user"""
+    at = _app_test("analysis")
+    at.run()
+    runs = []
+    for _ in range(repeat):
+        _select(at, "Periode:", period)
+        _select(at, "Urutan:", sort_order)
+        runs.append(_timed_run(at))
+        # Kembali ke default supaya run berikutnya juga mengubah filter
+        _select(at, "Periode:", PERIODS[0])
+        _select(at, "Urutan:", SORT_ORDERS[0])
+        at.run()
+    return {"runs": runs}
+
+
+def bench_submit(page, button_text, repeat):
+    """Rerun yang menyimpan data: submit form FINDRISC atau form kopi"""
+    at = _app_test(page)
+    at.run()
+    if page == "findrisc" and at.checkbox:
+        # Tes masih valid: form baru tampil setelah checkbox isi ulang dicentang
+        at.checkbox[0].check()
+        at.run()
+    runs = []
+    for _ in range(repeat):
+        _click(at, button_text)
+        runs.append(_timed_run(at))
+    return {"runs": runs}
+
+
+def run_child(size, storage, repeat):
+    """Dijalankan di proses anak: seed data lalu ukur semua skenario"""
+    sys.path.insert(0, ROOT)
+    os.environ["GLUCOFFEE_STORAGE"] = storage
+    _install_stub_model()
+    from storage import get_store
+
+    workdir = tempfile.mkdtemp(prefix="glucoffee_bench_")
+    os.chdir(workdir)
+    started = time.perf_counter()
+    store = get_store("glucoffee_users")
+    store.save(USER_ID, synthetic_document(size))
+    seed_seconds = time.perf_counter() - started
+
+    results = []
+    for page in PAGES:
+        results.append({"scenario": f"page:{page}", **bench_page(page, repeat)})
+    for period in PERIODS:
+        for sort_order in SORT_ORDERS:
+            results.append({
+                "scenario": f"analysis-filter:{period}|{sort_order}",
+                **bench_analysis_filter(period, sort_order, repeat)
+            })
+    results.append({"scenario": "submit:findrisc", **bench_submit("findrisc", "Hitung", repeat)})
+    results.append({"scenario": "submit:coffee", **bench_submit("coffee", "Simpan Konsumsi", repeat)})
+
+    for result in results:
+        result["size"] = size
+        result["median"] = statistics.median(result["runs"])
+        result["min"] = min(result["runs"])
+    print(json.dumps({"size": size, "seed_seconds": seed_seconds, "results": results}))
+
+
+def run_size(size, storage, repeat):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", str(size),
+         "--storage", storage, "--repeat", str(repeat)],
+        capture_output=True, text=True, check=False
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark {size} entri gagal:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark render per halaman GluCoffee")
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES,
+                        help="jumlah entri riwayat sintetis")
+    parser.add_argument("--storage", choices=["sqlite", "json"], default="sqlite")
+    parser.add_argument("--repeat", type=int, default=3, help="jumlah run terukur per skenario")
+    parser.add_argument("--json", default="bench_pages.json", help="file hasil JSON")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        run_child(args.child, args.storage, max(1, args.repeat))
+        return 0
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "storage": args.storage,
+        "repeat": args.repeat,
+        "sizes": [],
+    }
+    print(f"{'entri':>7} {'skenario':<52} {'pertama':>8} {'median':>8}")
+    for size in args.sizes:
+        result = run_size(size, args.storage, args.repeat)
+        report["sizes"].append(result)
+        print(f"{size:>7} {'seed data':<52} {result['seed_seconds']:>8.3f}")
+        for row in result["results"]:
+            first = f"{row['first']:.3f}" if "first" in row else "-"
+            print(f"{size:>7} {row['scenario']:<52} {first:>8} {row['median']:>8.3f}")
+
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Hasil disimpan di {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Benchmark cold start per halaman.
+
+Setiap halaman dijalankan di proses Python baru (dengan `-X importtime`)
+lewat Streamlit AppTest, memakai data user contoh di folder sementara.
+Dilaporkan waktu run pertama, total waktu import selama run tersebut, dan
+modul berat mana yang ikut dimuat.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --pages home analysis --json hasil.json
+
+Model Gemini diganti stub (SDK tetap di-import agar biaya import-nya
+terukur), sehingga benchmark tidak memerlukan jaringan maupun API key.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["home", "findrisc", "coffee", "analysis"]
+HEAVY_MODULES = ["numpy", "pandas", "matplotlib", "google.generativeai"]
+MARKER = "=== glucoffee page run ==="
+
+# Dijalankan di proses anak: argv[1] = root repo, argv[2] = halaman
+CHILD = r'''
+import json, os, sys, time
+from datetime import datetime, timedelta
+sys.path.insert(0, sys.argv[1])
+page = sys.argv[2]
+
+from streamlit.testing.v1 import AppTest
+
+class StubResponse:
+    text = "Rekomendasi benchmark."
+    def __iter__(self):
+        yield self
+
+class StubModel:
+    def generate_content(self, prompt, stream=False, **kwargs):
+        return StubResponse()
+
+def stub_create_model(api_key):
+    import google.generativeai
+    return StubModel()
+
+import ai_client
+ai_client.create_model = stub_create_model
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+os.makedirs("glucoffee_users", exist_ok=True)
+now = datetime.now()
+history = [
+    {"date": (now - timedelta(hours=6 * i)).isoformat(), "drink": "Kopi Susu",
+     "volume": "Reguler (≈350ml)", "quantity": 1, "topping": [], "sugar": 9.5}
+    for i in range(200)
+]
+doc = {
+    "user_profile": {"name": "Benchmark", "created_at": now.isoformat()},
+    "findrisc": {"score": 8, "risk_level": "Sedikit Meningkat",
+                 "last_updated": now.isoformat(), "raw_answers": {}},
+    "coffee_history": history,
+}
+with open(os.path.join("glucoffee_users", "user_bench.json"), "w", encoding="utf-8") as f:
+    json.dump(doc, f)
+
+before = set(sys.modules)
+at = AppTest.from_file(os.path.join(sys.argv[1], "app.py"), default_timeout=120)
+at.session_state["browser_id"] = "bench"
+at.session_state["active_page"] = page
+print("''' + MARKER + r'''", file=sys.stderr, flush=True)
+started = time.perf_counter()
+at.run()
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "run_seconds": elapsed,
+    "exceptions": [str(e.value) for e in at.exception],
+    "new_modules": sorted(set(sys.modules) - before),
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """Total waktu (detik) import top-level yang terjadi setelah marker"""
+    total_us = 0
+    seen_marker = False
+    for line in stderr.splitlines():
+        if MARKER in line:
+            seen_marker = True
+            continue
+        if not seen_marker or not line.startswith("import time:"):
+            continue
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        # Import bersarang diberi indentasi; yang top-level sudah mencakup anaknya
+        name = parts[2][1:]
+        if not name.startswith(" "):
+            total_us += int(parts[1])
+    return total_us / 1e6
+
+
+def run_page(page):
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, GLUCOFFEE_STORAGE="json")
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD, ROOT, page],
+            cwd=workdir, env=env, capture_output=True, text=True, check=False
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"halaman {page} gagal:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    loaded = set(result.pop("new_modules"))
+    result["page"] = page
+    result["import_seconds"] = parse_importtime(proc.stderr)
+    result["heavy_modules"] = [name for name in HEAVY_MODULES if name in loaded]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cold start per halaman GluCoffee")
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=PAGES)
+    parser.add_argument("--json", help="simpan hasil ke file JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'halaman':<10} {'run (s)':>8} {'import (s)':>11}  modul berat")
+    for page in args.pages:
+        result = run_page(page)
+        results.append(result)
+        print(f"{page:<10} {result['run_seconds']:>8.3f} {result['import_seconds']:>11.3f}  "
+              f"{', '.join(result['heavy_modules']) or '-'}")
+        if result["exceptions"]:
+            print(f"  exception: {result['exceptions']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,420 @@
+"""Load test: banyak session browser bersamaan di satu proses server.
+
+Streamlit menjalankan semua session di satu proses, masing-masing di thread
+sendiri. Harness ini meniru itu dengan N session AppTest yang berjalan
+bersamaan (thread pool) di satu proses, dengan store dan cache_resource yang
+dipakai bersama. Setiap session menjalankan alur realistis:
+
+1. buat profil di Home
+2. isi dan submit tes FINDRISC
+3. catat beberapa kopi
+4. buka Hasil Analisis (memicu panggilan AI)
+
+Model Gemini diganti stub lokal yang menyuntikkan latensi (spesifikasi sama
+dengan GLUCOFFEE_CASSETTE_LATENCY, mis. "lognormal:1.5,0.5"), jadi tidak ada
+panggilan jaringan.
+
+    python benchmarks/load_test.py --sessions 20
+    python benchmarks/load_test.py --sessions 50 --waves 3 --tabs 2 --storage json --json hasil.json
+
+Dilaporkan p50/p95/p99 latensi rerun (total dan per langkah), throughput
+rerun per detik, pertumbuhan file descriptor dan memori (RSS) per wave, dan
+jumlah penulisan yang hilang: setelah semua session selesai, dokumen setiap
+user dimuat ulang dari store dan dibandingkan dengan apa yang sudah disubmit.
+Dengan --tabs > 1 beberapa session memakai browser_id yang sama, seperti
+satu user yang membuka beberapa tab.
+
+Exit code 1 jika ada session yang gagal atau satu saja penulisan yang hilang,
+jadi harness ini bisa dipakai sebagai cek regresi untuk kedua backend:
+
+    python benchmarks/load_test.py --storage json --tabs 2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEPS = ["home", "profile", "findrisc", "findrisc_submit", "coffee", "coffee_submit", "analysis"]
+
+
+def percentiles(values):
+    """p50/p95/p99, mean, dan max dari daftar latensi (detik)"""
+    if not values:
+        return {"count": 0}
+    if len(values) == 1:
+        cuts = values * 99
+    else:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "count": len(values),
+        "p50": cuts[49],
+        "p95": cuts[94],
+        "p99": cuts[98],
+        "mean": statistics.fmean(values),
+        "max": max(values),
+    }
+
+
+def open_fds():
+    """Jumlah file descriptor terbuka (Linux), atau None"""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def rss_mb():
+    """RSS saat ini dalam MB; di luar Linux memakai puncak RSS"""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class ResourceSampler(threading.Thread):
+    """Catat puncak fd dan RSS selama load test berjalan"""
+
+    def __init__(self, interval=0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_fds = open_fds()
+        self.peak_rss_mb = rss_mb()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            fds = open_fds()
+            if fds is not None:
+                self.peak_fds = max(self.peak_fds, fds)
+            self.peak_rss_mb = max(self.peak_rss_mb, rss_mb())
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def install_stub_model(latency_spec, chunks, chunk_gap, seed):
+    """Ganti ai_client.create_model dengan stub streaming berlatensi"""
+    from ai_cassette import LatencyModel, ReplayChunk
+
+    latency = LatencyModel(latency_spec, seed=seed)
+    text = "Rekomendasi load test. " * 8
+
+    class StubStream:
+        def __iter__(self):
+            time.sleep(latency.first_token(0.0))
+            for index in range(chunks):
+                if index:
+                    time.sleep(latency.chunk_gap(chunk_gap))
+                yield ReplayChunk(text)
+
+        @property
+        def text(self):
+            return "".join(chunk.text for chunk in self)
+
+    class StubModel:
+        def generate_content(self, prompt, stream=False, **kwargs):
+            response = StubStream()
+            if stream:
+                return response
+            time.sleep(latency.first_token(0.0))
+            return ReplayChunk(text * chunks)
+
+        def count_tokens(self, contents):
+            return None
+
+    import ai_client
+    ai_client.create_model = lambda api_key, **kwargs: StubModel()
+    os.environ.setdefault("GEMINI_API_KEY", "load-test")
+
+
+def share_runtime():
+    """Satu Runtime tiruan untuk semua session, seperti satu server Streamlit
+
+    AppTest memasang Runtime tiruan baru di setiap run lalu menghapusnya
+    lagi, yang tidak aman jika beberapa AppTest berjalan bersamaan. Di sini
+    Runtime.instance() selalu mengembalikan satu objek yang sama, sehingga
+    cache st.cache_data juga dipakai bersama seperti di server sungguhan.
+    Begitu juga bytecode app.py: server meng-compile script sekali, sedangkan
+    AppTest meng-compile ulang di setiap run (dan ast.parse di beberapa thread
+    sekaligus bisa gagal di Python 3.11).
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import local_script_runner
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    script_cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: script_cache
+
+
+class Session:
+    """Satu tab browser: AppTest dengan browser_id sendiri"""
+
+    def __init__(self, user_id, rng, coffees, think):
+        from streamlit.testing.v1 import AppTest
+
+        self.user_id = user_id
+        self.rng = rng
+        self.coffees = coffees
+        self.think = think
+        self.latencies = []
+        self.errors = []
+        self.submitted_coffees = 0
+        self.submitted_profile = False
+        self.submitted_findrisc = False
+        self.step = None
+        self.at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+        self.at.session_state["browser_id"] = user_id
+
+    def _run(self, step, navigate=False):
+        self.step = step
+        if self.think:
+            time.sleep(self.rng.uniform(0, self.think))
+        started = time.perf_counter()
+        if navigate:
+            # Pindah halaman tanpa mengirim state widget halaman lama; setelah
+            # st.rerun() tree AppTest masih memuat widget yang state-nya sudah dibuang
+            self.at._run()
+        else:
+            self.at.run()
+        elapsed = time.perf_counter() - started
+        self.latencies.append((step, elapsed))
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+
+    def _open(self, page):
+        self.at.session_state["active_page"] = page
+        self._run(page, navigate=True)
+
+    def _find(self, widgets, text):
+        widget = next((widget for widget in widgets if text in widget.label), None)
+        if widget is None:
+            titles = [title.value for title in self.at.title]
+            raise RuntimeError(f"{text!r} tidak ada di halaman {titles}")
+        return widget
+
+    def _submit(self, text, step):
+        self.step = step
+        self._find(self.at.button, text).click()
+        self._run(step)
+
+    def flow(self):
+        """home -> profil -> FINDRISC -> kopi x N -> analisis"""
+        at = self.at
+        self._open("home")
+        if at.text_input:
+            at.text_input[0].input(f"Load {self.user_id}")
+            self._submit("Mulai", "profile")
+            self.submitted_profile = True
+
+        self._open("findrisc")
+        if at.checkbox:
+            at.checkbox[0].check()
+            self._run("findrisc")
+        for box in at.selectbox:
+            box.select(self.rng.choice(box.options))
+        self._submit("Hitung", "findrisc_submit")
+        self.submitted_findrisc = True
+
+        self._open("coffee")
+        for _ in range(self.coffees):
+            drink = self._find(at.selectbox, "Jenis Kopi:")
+            drink.select(self.rng.choice(drink.options))
+            self._submit("Simpan Konsumsi", "coffee_submit")
+            self.submitted_coffees += 1
+
+        self._open("analysis")
+
+    def run(self):
+        try:
+            self.flow()
+        except Exception as e:
+            self.errors.append(f"{self.step}: {type(e).__name__}: {e}")
+        return self
+
+
+def check_writes(store, sessions):
+    """Bandingkan dokumen di store dengan yang sudah disubmit setiap user
+
+    Return dict jumlah user dan entri yang hilang.
+    """
+    expected = defaultdict(lambda: {"coffees": 0, "findrisc": False, "profile": False})
+    for session in sessions:
+        user = expected[session.user_id]
+        user["coffees"] += session.submitted_coffees
+        user["findrisc"] = user["findrisc"] or session.submitted_findrisc
+        user["profile"] = user["profile"] or session.submitted_profile
+
+    lost = {"users": 0, "coffee_entries": 0, "findrisc": 0, "profiles": 0}
+    for user_id, user in expected.items():
+        data = store.load(user_id)
+        if data is None:
+            if user["profile"]:
+                lost["users"] += 1
+                lost["coffee_entries"] += user["coffees"]
+            continue
+        missing = max(0, user["coffees"] - len(data['coffee_history']))
+        lost["coffee_entries"] += missing
+        if user["findrisc"] and data['findrisc']['score'] is None:
+            lost["findrisc"] += 1
+        if user["profile"] and not data['user_profile']['name']:
+            lost["profiles"] += 1
+    return lost
+
+
+def run_wave(wave, args, executor):
+    rng = random.Random(args.seed + wave)
+    users = max(1, args.sessions // args.tabs)
+    sessions = [
+        Session(f"load{wave}_{index % users}", random.Random(rng.random()), args.coffees, args.think)
+        for index in range(args.sessions)
+    ]
+    started = time.perf_counter()
+    list(executor.map(Session.run, sessions))
+    return sessions, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test session bersamaan GluCoffee")
+    parser.add_argument("--sessions", type=int, default=20, help="session bersamaan per wave")
+    parser.add_argument("--waves", type=int, default=1,
+                        help="jumlah wave berurutan (untuk melihat pertumbuhan fd/memori)")
+    parser.add_argument("--tabs", type=int, default=1, help="session per browser_id")
+    parser.add_argument("--coffees", type=int, default=3, help="kopi yang dicatat per session")
+    parser.add_argument("--think", type=float, default=0.2,
+                        help="jeda acak maksimum (detik) sebelum setiap rerun")
+    parser.add_argument("--ai-latency", default="lognormal:1.0,0.5",
+                        help="latensi token pertama stub AI (fixed:S, uniform:A,B, lognormal:MEDIAN,SIGMA, none)")
+    parser.add_argument("--ai-chunks", type=int, default=4, help="potongan stream per respons")
+    parser.add_argument("--ai-chunk-gap", type=float, default=0.05, help="jeda antar potongan (detik)")
+    parser.add_argument("--storage", choices=["sqlite", "json"], default="sqlite")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="simpan hasil ke file JSON")
+    args = parser.parse_args(argv)
+    args.sessions = max(1, args.sessions)
+    args.tabs = max(1, args.tabs)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    sys.path.insert(0, ROOT)
+    os.environ["GLUCOFFEE_STORAGE"] = args.storage
+    workdir = tempfile.mkdtemp(prefix="glucoffee_load_")
+    os.chdir(workdir)
+    install_stub_model(args.ai_latency, max(1, args.ai_chunks), args.ai_chunk_gap, args.seed)
+    # Import streamlit dulu supaya tidak terhitung sebagai pertumbuhan memori
+    import streamlit.testing.v1  # noqa: F401
+    share_runtime()
+    from storage import get_store
+
+    baseline = {"fds": open_fds(), "rss_mb": rss_mb()}
+    sampler = ResourceSampler()
+    sampler.start()
+
+    waves = []
+    all_sessions = []
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        for wave in range(args.waves):
+            sessions, elapsed = run_wave(wave, args, executor)
+            all_sessions.extend(sessions)
+            reruns = sum(len(session.latencies) for session in sessions)
+            waves.append({
+                "wave": wave,
+                "seconds": elapsed,
+                "reruns": reruns,
+                "reruns_per_second": reruns / elapsed if elapsed > 0 else 0.0,
+                "errors": sum(len(session.errors) for session in sessions),
+                "fds": open_fds(),
+                "rss_mb": rss_mb(),
+            })
+            print(f"wave {wave}: {reruns} rerun dalam {elapsed:.1f}s "
+                  f"({waves[-1]['reruns_per_second']:.1f}/s), fd={waves[-1]['fds']}, "
+                  f"rss={waves[-1]['rss_mb']:.0f}MB", file=sys.stderr)
+    sampler.stop()
+
+    # Store terpisah dari yang dipakai app, supaya yang dibaca benar-benar isi disk
+    lost = check_writes(get_store("glucoffee_users"), all_sessions)
+
+    latencies = [elapsed for session in all_sessions for _, elapsed in session.latencies]
+    by_step = defaultdict(list)
+    for session in all_sessions:
+        for step, elapsed in session.latencies:
+            by_step[step].append(elapsed)
+    total_seconds = sum(wave["seconds"] for wave in waves)
+    errors = [error for session in all_sessions for error in session.errors]
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key != "json"},
+        "latency": percentiles(latencies),
+        "latency_by_step": {step: percentiles(by_step[step]) for step in STEPS if step in by_step},
+        "throughput_reruns_per_second": len(latencies) / total_seconds if total_seconds > 0 else 0.0,
+        "sessions_per_second": len(all_sessions) / total_seconds if total_seconds > 0 else 0.0,
+        "resources": {
+            "baseline": baseline,
+            "waves": waves,
+            "peak_fds": max([sampler.peak_fds] + [wave["fds"] for wave in waves])
+            if baseline["fds"] is not None else None,
+            "peak_rss_mb": max([sampler.peak_rss_mb] + [wave["rss_mb"] for wave in waves]),
+            "fd_growth": (waves[-1]["fds"] - baseline["fds"]) if baseline["fds"] is not None else None,
+            "rss_growth_mb": waves[-1]["rss_mb"] - baseline["rss_mb"],
+        },
+        "lost_writes": lost,
+        "errors": errors[:20],
+        "error_count": len(errors),
+    }
+
+    print(f"{'langkah':<16} {'n':>5} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}")
+    for step, stats in [("semua", report["latency"]), *report["latency_by_step"].items()]:
+        if stats["count"]:
+            print(f"{step:<16} {stats['count']:>5} {stats['p50']:>7.3f} {stats['p95']:>7.3f} "
+                  f"{stats['p99']:>7.3f} {stats['max']:>7.3f}")
+    resources = report["resources"]
+    print(f"throughput: {report['throughput_reruns_per_second']:.1f} rerun/s, "
+          f"{report['sessions_per_second']:.2f} session/s")
+    print(f"fd: {baseline['fds']} -> {waves[-1]['fds']} (puncak {resources['peak_fds']}), "
+          f"rss: {baseline['rss_mb']:.0f} -> {waves[-1]['rss_mb']:.0f}MB (puncak {resources['peak_rss_mb']:.0f}MB)")
+    print(f"penulisan hilang: {lost['coffee_entries']} entri kopi, {lost['findrisc']} FINDRISC, "
+          f"{lost['profiles']} profil, {lost['users']} user")
+    if errors:
+        print(f"{len(errors)} session gagal:")
+        for error in errors[:5]:
+            print(f"  {error}")
+    if any(lost.values()):
+        print(f"GAGAL: penulisan hilang di store {args.storage} dengan {args.tabs} tab per user",
+              file=sys.stderr)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 1 if errors or any(lost.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
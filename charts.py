@@ -0,0 +1,98 @@
+"""Grafik kuota gula harian untuk halaman Hasil Analisis.
+
+Dua mode, dipilih lewat GLUCOFFEE_CHART_MODE:
+
+- "image"  (default): pie chart matplotlib yang dirender ke PNG. Hasil render
+  di-cache per nilai gula (dibulatkan 0.1g, sama dengan label di grafik) dan
+  figure dibuat tanpa pyplot sehingga tidak pernah menumpuk di memori proses.
+- "native": spesifikasi Vega-Lite untuk st.vega_lite_chart, tanpa matplotlib.
+"""
+import io
+import os
+from functools import lru_cache
+
+from sugar_stats import DAILY_LIMIT
+
+CHART_MODE = os.getenv("GLUCOFFEE_CHART_MODE", "image")
+
+
+def quota_slices(today_sugar):
+    """Potongan pie (ukuran, label, warna, explode) untuk gula hari ini"""
+    if today_sugar <= 0:
+        return [(100, 'Belum ada konsumsi (0g)', '#e0e0e0', 0)]
+    if today_sugar > DAILY_LIMIT:
+        return [
+            (DAILY_LIMIT, f'Batas Aman ({DAILY_LIMIT}g)', '#ff6b6b', 0),
+            (today_sugar - DAILY_LIMIT, f'Kelebihan ({today_sugar - DAILY_LIMIT:.1f}g)', '#ee5a6f', 0.1),
+        ]
+    sisa = DAILY_LIMIT - today_sugar
+    return [
+        (today_sugar, f'Terpakai ({today_sugar:.1f}g)', '#ffd93d', 0.05),
+        (sisa, f'Sisa ({sisa:.1f}g)', '#6bcf7f', 0),
+    ]
+
+
+@lru_cache(maxsize=512)
+def _render_png(sugar_key):
+    # Import di sini: matplotlib hanya dimuat jika mode image benar-benar dipakai
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    today_sugar = sugar_key / 10
+    slices = quota_slices(today_sugar)
+    sizes, labels, colors, explode = zip(*slices)
+
+    # Figure tanpa pyplot tidak terdaftar di state global, jadi ikut dibebaskan GC
+    fig = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    if today_sugar > 0:
+        wedges, texts, autotexts = ax.pie(
+            sizes,
+            labels=labels,
+            autopct='%1.1f%%',
+            startangle=90,
+            colors=colors,
+            explode=explode,
+            textprops={'fontsize': 12, 'weight': 'bold'}
+        )
+        for autotext in autotexts:
+            autotext.set_color('white')
+    else:
+        ax.pie(sizes, labels=labels, colors=colors, startangle=90)
+    ax.axis('equal')
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=200, bbox_inches='tight')
+    fig.clear()
+    return buffer.getvalue()
+
+
+def quota_chart_png(today_sugar):
+    """PNG pie chart kuota harian (di-cache per 0.1g)"""
+    return _render_png(int(round(today_sugar * 10)))
+
+
+def quota_chart_spec(today_sugar):
+    """Spesifikasi Vega-Lite (arc) untuk pie chart kuota harian"""
+    slices = quota_slices(round(today_sugar, 1))
+    return {
+        "data": {"values": [
+            {"bagian": label, "gram": round(size, 1)}
+            for size, label, color, _ in slices
+        ]},
+        "mark": {"type": "arc", "tooltip": True},
+        "encoding": {
+            "theta": {"field": "gram", "type": "quantitative", "stack": True},
+            "color": {
+                "field": "bagian",
+                "type": "nominal",
+                "scale": {
+                    "domain": [label for _, label, _, _ in slices],
+                    "range": [color for _, _, color, _ in slices],
+                },
+                "legend": {"title": None, "orient": "bottom"},
+            },
+        },
+        "view": {"stroke": None},
+    }
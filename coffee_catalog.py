@@ -0,0 +1,98 @@
+"""Katalog minuman kopi GluCoffee beserta kandungan gulanya.
+
+Data ada di coffee_catalog.json (berversi): gula per gelas reguler untuk
+setiap minuman, pengali per ukuran gelas, dan gula per topping. File dibaca
+sekali saat modul di-import, lalu semua kombinasi minuman × ukuran × set
+topping disusun menjadi index yang terurut menurut gula, sehingga pilihan
+rendah gula yang masih muat dalam sisa kuota cukup dicari dengan bisect.
+
+Dipakai halaman Catat Kopi dan rule engine rekomendasi.
+"""
+import json
+import os
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import combinations
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "coffee_catalog.json")
+
+# Satu kombinasi minuman; `toppings` berurutan sesuai katalog
+Combo = namedtuple("Combo", "sugar drink size toppings")
+
+
+def load_catalog(path=CATALOG_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+CATALOG = load_catalog()
+CATALOG_VERSION = CATALOG["version"]
+COFFEE_DATABASE = CATALOG["drinks"]
+SIZES = CATALOG["sizes"]
+TOPPINGS = CATALOG["toppings"]
+DEFAULT_SIZE = next(iter(SIZES))
+
+# Diurutkan sekali saat import: (gula, nama) dari yang paling rendah
+DRINKS_BY_SUGAR = sorted((sugar, name) for name, sugar in COFFEE_DATABASE.items())
+
+
+def cup_sugar(drink, size=DEFAULT_SIZE):
+    """Gula satu gelas tanpa topping"""
+    return COFFEE_DATABASE[drink] * SIZES[size]
+
+
+def topping_sugar(toppings):
+    """Gula dari topping yang dipilih, sesuai nilai per topping di katalog"""
+    return sum(TOPPINGS[name] for name in toppings)
+
+
+def entry_sugar(drink, size, quantity, toppings):
+    """Total gula satu catatan: gula per gelas × jumlah gelas + topping"""
+    return cup_sugar(drink, size) * quantity + topping_sugar(toppings)
+
+
+def _build_index():
+    size_order = {size: index for index, size in enumerate(SIZES)}
+    topping_sets = [
+        combo
+        for count in range(len(TOPPINGS) + 1)
+        for combo in combinations(TOPPINGS, count)
+    ]
+    combos = sorted(
+        (
+            Combo(round(cup_sugar(drink, size) + topping_sugar(toppings), 2), drink, size, toppings)
+            for drink in COFFEE_DATABASE
+            for size in SIZES
+            for toppings in topping_sets
+        ),
+        # Gula sama: topping lebih sedikit, ukuran lebih kecil, lalu nama, supaya urutan stabil
+        key=lambda combo: (combo.sugar, len(combo.toppings), size_order[combo.size], combo.drink, combo.toppings)
+    )
+    return combos, [combo.sugar for combo in combos]
+
+
+COMBOS, COMBO_SUGARS = _build_index()
+
+
+def combos_within(max_sugar):
+    """Semua kombinasi satu gelas dengan gula <= `max_sugar`, terendah lebih dulu"""
+    return COMBOS[:bisect_right(COMBO_SUGARS, max_sugar)]
+
+
+def low_sugar_options(max_sugar, limit=5):
+    """Kombinasi terendah gula yang muat di `max_sugar`, satu per minuman"""
+    options = []
+    seen = set()
+    for combo in combos_within(max_sugar):
+        if combo.drink in seen:
+            continue
+        seen.add(combo.drink)
+        options.append(combo)
+        if len(options) == limit:
+            break
+    return options
+
+
+def lower_sugar_drinks(max_sugar, limit=3):
+    """Nama minuman dengan gula di bawah `max_sugar`, yang paling rendah lebih dulu"""
+    return [name for sugar, name in DRINKS_BY_SUGAR if sugar < max_sugar][:limit]
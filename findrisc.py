@@ -0,0 +1,223 @@
+"""Skor FINDRISC (Finnish Diabetes Risk Score) berbasis tabel.
+
+Setiap pertanyaan punya daftar opsi (kode, label, poin). Label adalah teks
+yang tampil di form halaman Tes FINDRISC dan tersimpan di `raw_answers`;
+kode adalah singkatan untuk file CSV. Keduanya dipetakan langsung ke poin,
+tanpa pencocokan substring.
+
+Skoring batch memakai pandas (vektor per kolom), untuk hari skrining di
+klinik dan untuk menghitung ulang `raw_answers` yang tersimpan:
+
+    python findrisc.py score skrining.csv -o hasil.csv
+    python findrisc.py rescore --data-folder glucoffee_users --apply
+
+Kolom CSV sama dengan key di QUESTION_KEYS; isinya boleh label atau kode
+(tidak peka huruf besar/kecil).
+"""
+import argparse
+import sys
+from collections import namedtuple
+
+from lazy_imports import lazy_module
+
+pd = lazy_module("pandas")
+
+Option = namedtuple("Option", "code label points")
+Question = namedtuple("Question", "key label options")
+RiskBand = namedtuple("RiskBand", "upper level description tone advice")
+
+QUESTIONS = [
+    Question("usia", "1. Usia Anda:", [
+        Option("<45", "Di bawah 45 tahun (0 poin)", 0),
+        Option("45-54", "45–54 tahun (2 poin)", 2),
+        Option("55-64", "55–64 tahun (3 poin)", 3),
+        Option(">64", "Di atas 64 tahun (4 poin)", 4),
+    ]),
+    Question("bmi", "2. Indeks Massa Tubuh (BMI):", [
+        Option("<25", "Di bawah 25 kg/m² (0 poin)", 0),
+        Option("25-30", "25–30 kg/m² (1 poin)", 1),
+        Option(">30", "Di atas 30 kg/m² (3 poin)", 3),
+    ]),
+    Question("lingkar_perut", "3. Lingkar Perut:", [
+        Option("normal", "Pria <94 cm / Wanita <80 cm (0 poin)", 0),
+        Option("sedang", "Pria 94–102 cm / Wanita 80–88 cm (3 poin)", 3),
+        Option("besar", "Pria >102 cm / Wanita >88 cm (4 poin)", 4),
+    ]),
+    Question("aktifitas", "4. Apakah Anda berolahraga minimal 30 menit setiap hari?", [
+        Option("ya", "Ya (0 poin)", 0),
+        Option("tidak", "Tidak (2 poin)", 2),
+    ]),
+    Question("makan_sayur", "5. Seberapa sering Anda makan sayur atau buah?", [
+        Option("setiap_hari", "Setiap hari (0 poin)", 0),
+        Option("tidak_setiap_hari", "Tidak setiap hari (1 poin)", 1),
+    ]),
+    Question("obat_hipertensi", "6. Pernahkah Anda minum obat antihipertensi secara rutin?", [
+        Option("tidak", "Tidak (0 poin)", 0),
+        Option("ya", "Ya (2 poin)", 2),
+    ]),
+    Question("pernah_gula_tinggi", "7. Pernahkah Anda ditemukan memiliki kadar gula darah tinggi?", [
+        Option("tidak", "Tidak (0 poin)", 0),
+        Option("ya", "Ya (5 poin)", 5),
+    ]),
+    Question("keluarga_dm", "8. Apakah ada anggota keluarga yang menderita diabetes?", [
+        Option("tidak", "Tidak (0 poin)", 0),
+        Option("jauh", "Ya: Kakek/nenek, paman/bibi, sepupu (3 poin)", 3),
+        Option("dekat", "Ya: Orang tua, saudara kandung, anak (5 poin)", 5),
+    ]),
+]
+QUESTION_KEYS = [question.key for question in QUESTIONS]
+QUESTIONS_BY_KEY = {question.key: question for question in QUESTIONS}
+
+# Label dan kode (huruf kecil) -> poin, satu tabel per pertanyaan
+POINTS = {
+    question.key: {
+        **{option.label.lower(): option.points for option in question.options},
+        **{option.code: option.points for option in question.options},
+    }
+    for question in QUESTIONS
+}
+
+# Batas atas skor (eksklusif) untuk setiap tingkat risiko
+RISK_BANDS = [
+    RiskBand(7, "Rendah", "1 dari 100 orang akan mengembangkan diabetes dalam 10 tahun",
+             "success", "Pertahankan gaya hidup sehat!"),
+    RiskBand(12, "Sedikit Meningkat", "1 dari 25 orang akan mengembangkan diabetes dalam 10 tahun",
+             "info", "Perhatikan pola makan"),
+    RiskBand(15, "Sedang", "1 dari 6 orang akan mengembangkan diabetes dalam 10 tahun",
+             "warning", "Konsultasi dengan dokter"),
+    RiskBand(20, "Tinggi", "1 dari 3 orang akan mengembangkan diabetes dalam 10 tahun",
+             "warning", "Pemeriksaan gula darah disarankan"),
+    RiskBand(float("inf"), "Sangat Tinggi", "1 dari 2 orang akan mengembangkan diabetes dalam 10 tahun",
+             "error", "Segera konsultasi dokter"),
+]
+
+
+def option_labels(key):
+    """Label opsi sebuah pertanyaan, untuk selectbox"""
+    return [option.label for option in QUESTIONS_BY_KEY[key].options]
+
+
+def answer_points(key, answer):
+    """Poin satu jawaban (label atau kode); ValueError jika tidak dikenal"""
+    points = POINTS[key].get(str(answer).strip().lower())
+    if points is None:
+        raise ValueError(f"jawaban FINDRISC tidak dikenal untuk {key}: {answer!r}")
+    return points
+
+
+def score_answers(answers):
+    """Total skor dari dict jawaban {key: label atau kode}"""
+    return sum(answer_points(key, answers[key]) for key in QUESTION_KEYS)
+
+
+def risk_band(score):
+    """RiskBand untuk sebuah skor"""
+    for band in RISK_BANDS:
+        if score < band.upper:
+            return band
+    return RISK_BANDS[-1]
+
+
+def score_frame(frame):
+    """Skor banyak kuesioner sekaligus
+
+    `frame` berisi satu kolom per key di QUESTION_KEYS. Return DataFrame
+    dengan index yang sama dan kolom `score` (Int64) dan `risk_level`;
+    baris dengan jawaban kosong atau tidak dikenal mendapat <NA>.
+    """
+    missing = [key for key in QUESTION_KEYS if key not in frame.columns]
+    if missing:
+        raise ValueError(f"kolom FINDRISC tidak ada: {', '.join(missing)}")
+
+    points = pd.concat(
+        [frame[key].astype("string").str.strip().str.lower().map(POINTS[key]) for key in QUESTION_KEYS],
+        axis=1
+    )
+    # min_count: satu jawaban tidak valid membuat skor baris itu <NA>, bukan skor parsial
+    score = points.sum(axis=1, min_count=len(QUESTION_KEYS)).astype("Int64")
+    bins = [float("-inf")] + [band.upper for band in RISK_BANDS]
+    risk_level = pd.cut(
+        score.astype("float64"), bins=bins, right=False,
+        labels=[band.level for band in RISK_BANDS]
+    )
+    return pd.DataFrame({"score": score, "risk_level": risk_level}, index=frame.index)
+
+
+def score_csv(source, destination=None, chunksize=50_000):
+    """Skor file CSV per potongan; tulis kolom asli + score + risk_level ke `destination`
+
+    Return (jumlah baris, jumlah baris tidak valid).
+    """
+    rows = invalid = 0
+    for index, chunk in enumerate(pd.read_csv(source, dtype="string", chunksize=chunksize)):
+        scored = chunk.join(score_frame(chunk))
+        rows += len(scored)
+        invalid += int(scored["score"].isna().sum())
+        if destination is not None:
+            scored.to_csv(destination, mode="w" if index == 0 else "a", header=index == 0, index=False)
+    return rows, invalid
+
+
+def rescore_store(store, apply=False):
+    """Hitung ulang skor dari `raw_answers` semua user di store
+
+    Return list (user_id, skor lama, skor baru) untuk skor yang berbeda;
+    dengan `apply=True` skor dan tingkat risiko baru langsung disimpan.
+    """
+    documents = {}
+    for user_id in store.user_ids():
+        data = store.load(user_id)
+        if data is not None and data['findrisc'].get('raw_answers'):
+            documents[user_id] = data
+    if not documents:
+        return []
+
+    frame = pd.DataFrame.from_dict(
+        {user_id: data['findrisc']['raw_answers'] for user_id, data in documents.items()},
+        orient="index"
+    ).reindex(columns=QUESTION_KEYS)
+    scored = score_frame(frame)
+
+    changed = []
+    for user_id, score, risk_level in zip(scored.index, scored["score"], scored["risk_level"]):
+        data = documents[user_id]
+        old_score = data['findrisc']['score']
+        if pd.isna(score) or (score == old_score and risk_level == data['findrisc']['risk_level']):
+            continue
+        changed.append((user_id, old_score, int(score)))
+        if apply:
+            data['findrisc']['score'] = int(score)
+            data['findrisc']['risk_level'] = risk_level
+            store.save(user_id, data)
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Skoring FINDRISC GluCoffee")
+    sub = parser.add_subparsers(dest="command", required=True)
+    score = sub.add_parser("score", help="skor kuesioner dari file CSV")
+    score.add_argument("csv", help="file CSV dengan kolom " + ", ".join(QUESTION_KEYS))
+    score.add_argument("-o", "--output", help="tulis CSV hasil (kolom asli + score + risk_level)")
+    score.add_argument("--chunksize", type=int, default=50_000)
+    rescore = sub.add_parser("rescore", help="hitung ulang skor dari raw_answers yang tersimpan")
+    rescore.add_argument("--data-folder", default="glucoffee_users")
+    rescore.add_argument("--storage", choices=["sqlite", "json"])
+    rescore.add_argument("--apply", action="store_true", help="simpan skor baru yang berbeda")
+    args = parser.parse_args(argv)
+
+    if args.command == "score":
+        rows, invalid = score_csv(args.csv, args.output, args.chunksize)
+        print(f"{rows} kuesioner diskor, {invalid} tidak valid", file=sys.stderr)
+        return 1 if invalid else 0
+
+    from storage import get_store
+    changed = rescore_store(get_store(args.data_folder, args.storage), apply=args.apply)
+    for user_id, old_score, new_score in changed:
+        print(f"{user_id}: {old_score} -> {new_score}", file=sys.stderr)
+    action = "diperbarui" if args.apply else "berbeda (jalankan dengan --apply untuk menyimpan)"
+    print(f"{len(changed)} skor {action}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Representasi kolom (NumPy) dari riwayat kopi.
+
+Riwayat disimpan sebagai list dict dengan timestamp string ISO. Untuk filter
+periode, pengurutan, dan pengelompokan per hari, riwayat dikonversi sekali
+per load menjadi array:
+
+- timestamps : datetime64[us]
+- days       : datetime64[D]
+- sugar      : float64 (bukan float32, supaya round-trip ke dict tetap persis)
+- quantity   : int16
+- drink, volume : kode kategori int16 ke list `drinks` / `volumes`
+- topping    : kode kombinasi topping (urutan pilihan dipertahankan) dan
+               bitmask uint32 per topping
+"""
+from lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+
+DATE_UNIT = 'us'
+
+
+def _factorize(values):
+    """Ubah list nilai menjadi (kode int16, daftar kategori)"""
+    categories = {}
+    codes = np.fromiter(
+        (categories.setdefault(value, len(categories)) for value in values),
+        dtype=np.int16,
+        count=len(values)
+    )
+    return codes, list(categories)
+
+
+class HistoryColumns:
+    """Array kolom untuk satu list `coffee_history`"""
+
+    def __init__(self, history):
+        self.source = history
+        n = len(history)
+        self.timestamps = np.array([e['date'] for e in history], dtype=f'datetime64[{DATE_UNIT}]')
+        self.days = self.timestamps.astype('datetime64[D]')
+        self.sugar = np.fromiter((e['sugar'] for e in history), dtype=np.float64, count=n)
+        self.quantity = np.fromiter((e['quantity'] for e in history), dtype=np.int16, count=n)
+        self.drink, self.drinks = _factorize([e['drink'] for e in history])
+        self.volume, self.volumes = _factorize([e['volume'] for e in history])
+        self.topping_combo, self.topping_combos = _factorize([tuple(e['topping']) for e in history])
+
+        toppings = {}
+        combo_masks = np.zeros(len(self.topping_combos), dtype=np.uint32)
+        for code, combo in enumerate(self.topping_combos):
+            for name in combo:
+                combo_masks[code] |= np.uint32(1 << toppings.setdefault(name, len(toppings)))
+        self.toppings = list(toppings)
+        self.topping_mask = combo_masks[self.topping_combo] if n else np.zeros(0, dtype=np.uint32)
+        # Tipe asli angka gula (int/float) untuk round-trip yang persis
+        self._sugar_is_int = [type(e['sugar']) is int for e in history]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def is_current(self, history):
+        """True jika kolom masih mewakili list riwayat ini"""
+        return self.source is history and len(self) == len(history)
+
+    def since(self, day=None):
+        """Index entri pada atau setelah tanggal `day` (string ISO / None = semua)"""
+        if day is None:
+            return np.arange(len(self))
+        return np.flatnonzero(self.days >= np.datetime64(day, 'D'))
+
+    def with_topping(self, name):
+        """Mask entri yang memakai topping tertentu"""
+        if name not in self.toppings:
+            return np.zeros(len(self), dtype=bool)
+        return (self.topping_mask & np.uint32(1 << self.toppings.index(name))) != 0
+
+    def order(self, idx, sort_order):
+        """Urutkan index sesuai pilihan "Terbaru" / "Terlama" / "Gula Tertinggi" (stabil)"""
+        if sort_order == "Gula Tertinggi":
+            keys = -self.sugar[idx]
+        elif sort_order == "Terbaru":
+            keys = -self.timestamps[idx].astype(np.int64)
+        else:
+            keys = self.timestamps[idx]
+        return idx[np.argsort(keys, kind='stable')]
+
+    def daily_totals(self, idx):
+        """(hari unik terurut, total gula per hari, inverse) untuk index `idx`"""
+        days, inverse = np.unique(self.days[idx], return_inverse=True)
+        totals = np.bincount(inverse, weights=self.sugar[idx], minlength=len(days))
+        return days, totals, inverse
+
+    def date_string(self, i):
+        text = np.datetime_as_string(self.timestamps[i], unit=DATE_UNIT)
+        # datetime.isoformat() tidak menulis mikrodetik jika nilainya nol
+        return text[:-len('.000000')] if text.endswith('.000000') else text
+
+    def record(self, i):
+        """Entri ke-i dalam format dict asli"""
+        i = int(i)
+        sugar = float(self.sugar[i])
+        return {
+            "date": self.date_string(i),
+            "drink": self.drinks[self.drink[i]],
+            "volume": self.volumes[self.volume[i]],
+            "quantity": int(self.quantity[i]),
+            "topping": list(self.topping_combos[self.topping_combo[i]]),
+            "sugar": int(sugar) if self._sugar_is_int[i] else sugar,
+        }
+
+    def records(self, idx=None):
+        """List entri dict untuk index `idx` (default semua)"""
+        if idx is None:
+            idx = range(len(self))
+        return [self.record(i) for i in idx]
@@ -0,0 +1,45 @@
+"""Statistik riwayat konsumsi untuk halaman Hasil Analisis.
+
+Filter periode, pengurutan, total per hari, hari di atas batas, dan
+pengelompokan per hari dihitung sebagai operasi array di atas
+HistoryColumns, tanpa mem-parse ulang timestamp setiap entri.
+"""
+from lazy_imports import lazy_module
+from sugar_stats import DAILY_LIMIT
+
+np = lazy_module("numpy")
+
+
+def summarize_history(columns, since_day=None, sort_order="Terbaru", limit=DAILY_LIMIT):
+    """Filter, urutkan, hitung statistik, dan kelompokkan entri per hari
+
+    Return dict berisi total_entries, total_sugar, unique_days, avg_per_day,
+    daily_totals, days_over_limit, dan grouped: list (hari, index entri,
+    total) dengan hari terbaru lebih dulu hanya untuk urutan "Terbaru".
+    Index entri mengikuti `sort_order` dan bisa diubah ke dict dengan
+    `columns.records(index)`.
+    """
+    idx = columns.order(columns.since(since_day), sort_order)
+    days, totals, inverse = columns.daily_totals(idx)
+
+    # Pecah index terurut menjadi grup per hari; argsort stabil menjaga urutan di dalam grup
+    by_day = idx[np.argsort(inverse, kind='stable')]
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(days)))[:-1]
+    members = np.split(by_day, bounds) if len(idx) else []
+
+    day_names = np.datetime_as_string(days, unit='D').tolist()
+    grouped = list(zip(day_names, members, totals.tolist()))
+    if sort_order == "Terbaru":
+        grouped.reverse()
+
+    total_sugar = float(totals.sum())
+    unique_days = len(days)
+    return {
+        "total_entries": len(idx),
+        "total_sugar": total_sugar,
+        "unique_days": unique_days,
+        "avg_per_day": total_sugar / unique_days if unique_days > 0 else 0,
+        "daily_totals": dict(zip(day_names, totals.tolist())),
+        "days_over_limit": int((totals > limit).sum()),
+        "grouped": grouped,
+    }
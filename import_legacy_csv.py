@@ -0,0 +1,201 @@
+"""Impor riwayat dari riwayat_pengguna.csv (format app versi lama) ke store user.
+
+Contoh:
+    python import_legacy_csv.py riwayat_pengguna.csv --user-id legacy --name "Pengguna Lama"
+    python import_legacy_csv.py riwayat_pengguna.csv --user-id legacy --dry-run
+
+File CSV dibaca baris demi baris (teks analisis AI multi-baris di kolom
+hasil_analisis langsung dibuang), lalu entri dimasukkan ke store per batch,
+jadi memori tidak bergantung pada ukuran file: duplikat dicek ke store per
+batch dan riwayat user tidak dimuat ke memori selama impor (kecuali sekali
+saat journal JSON dipadatkan di akhir). Setiap baris dipetakan ke skema entri
+saat ini:
+
+- tipe_gelas  -> ukuran katalog dengan volume (ml) terdekat
+- topping     -> topping katalog dengan nama yang sama; yang tidak dikenal
+                 dilewati dan dilaporkan
+- gula        -> dihitung ulang dari coffee_catalog.json
+
+Kolom aktivitas, usia, riwayat, gula_darah, dan hasil_analisis tidak punya
+padanan di skema sekarang dan tidak diimpor. Entri dengan tanggal dan
+minuman yang sudah ada di riwayat user dilewati, jadi impor aman diulang.
+Dry run tidak menulis batch ke store, jadi duplikat dicek terhadap store dan
+di dalam batch yang sama saja; baris yang juga muncul di batch sebelumnya
+pada file yang sama dihitung sebagai diimpor.
+"""
+import argparse
+import csv
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+import coffee_catalog
+from storage import get_store, init_data_structure
+
+# Kolom analisis AI bisa sangat panjang; batas default modul csv hanya 128KB
+csv.field_size_limit(16 * 1024 * 1024)
+
+# Baris tidak valid yang dicetak satu per satu; sisanya hanya dihitung
+MAX_LOGGED_ERRORS = 20
+EMPTY_TOPPINGS = {"", "-", "tidak ada", "tanpa topping", "none"}
+ML_PATTERN = re.compile(r"(\d+)\s*ml", re.IGNORECASE)
+
+
+def _volume_ml(label):
+    match = ML_PATTERN.search(label)
+    return int(match.group(1)) if match else None
+
+
+SIZE_ML = {size: _volume_ml(size) for size in coffee_catalog.SIZES}
+TOPPINGS_BY_NAME = {name.split("(")[0].strip().lower(): name for name in coffee_catalog.TOPPINGS}
+
+
+def map_size(label):
+    """Ukuran katalog dengan volume terdekat; ukuran default jika volume tidak terbaca"""
+    if label in coffee_catalog.SIZES:
+        return label
+    ml = _volume_ml(label or "")
+    if ml is None:
+        return coffee_catalog.DEFAULT_SIZE
+    return min(SIZE_ML, key=lambda size: abs(SIZE_ML[size] - ml))
+
+
+def map_toppings(value):
+    """(topping katalog, topping tidak dikenal) dari isi kolom topping lama"""
+    known, unknown = [], []
+    for part in (value or "").split(","):
+        name = part.split("(")[0].strip().lower()
+        if name in EMPTY_TOPPINGS:
+            continue
+        if name in TOPPINGS_BY_NAME:
+            known.append(TOPPINGS_BY_NAME[name])
+        else:
+            unknown.append(part.strip())
+    return known, unknown
+
+
+def legacy_entry(row):
+    """Entri kopi dari satu baris CSV lama; ValueError jika tidak bisa dipetakan
+
+    Return (entry, topping tidak dikenal).
+    """
+    drink = (row.get('jenis_kopi') or "").strip()
+    if drink not in coffee_catalog.COFFEE_DATABASE:
+        raise ValueError(f"jenis kopi tidak ada di katalog: {drink!r}")
+    date = datetime.fromisoformat(row['timestamp'].strip()).isoformat()
+    quantity = int(row.get('jumlah_gelas') or 1)
+    volume = map_size(row.get('tipe_gelas'))
+    toppings, unknown = map_toppings(row.get('topping'))
+    entry = {
+        "date": date,
+        "drink": drink,
+        "volume": volume,
+        "quantity": quantity,
+        "topping": toppings,
+        "sugar": coffee_catalog.entry_sugar(drink, volume, quantity, toppings),
+    }
+    return entry, unknown
+
+
+def iter_rows(path):
+    """Baris CSV sebagai dict, dibaca satu per satu"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_csv(path, store, user_id, name=None, batch_size=1000, dry_run=False, log=None):
+    """Impor file CSV lama ke riwayat `user_id`; return Counter hasil per status"""
+    log = log or (lambda message: print(message, file=sys.stderr))
+    counts = Counter()
+    unknown_toppings = Counter()
+
+    if user_id not in store.user_ids():
+        data = init_data_structure()
+        data['user_profile']['name'] = name or user_id
+        data['user_profile']['created_at'] = datetime.now().isoformat()
+        if not dry_run:
+            store.save(user_id, data)
+
+    started = time.perf_counter()
+    for batch in batched(iter_rows(path), batch_size):
+        mapped = []
+        for row in batch:
+            counts["rows"] += 1
+            try:
+                entry, unknown = legacy_entry(row)
+            except (KeyError, TypeError, ValueError) as e:
+                counts["invalid"] += 1
+                if counts["invalid"] <= MAX_LOGGED_ERRORS:
+                    log(f"  baris {counts['rows']} dilewati: {e}")
+                continue
+            unknown_toppings.update(unknown)
+            mapped.append(entry)
+
+        # Batch sebelumnya sudah ada di store, jadi cukup cek duplikat di dalam batch ini
+        seen = store.existing_keys(user_id, [(entry['date'], entry['drink']) for entry in mapped])
+        entries = []
+        for entry in mapped:
+            key = (entry['date'], entry['drink'])
+            if key in seen:
+                counts["duplicate"] += 1
+                continue
+            seen.add(key)
+            entries.append(entry)
+
+        counts["imported"] += len(entries)
+        if entries and not dry_run:
+            # Journal JSON dipadatkan sekali di akhir, bukan setiap batch
+            store.add_coffee_batch(user_id, None, entries, compact=False)
+
+        elapsed = time.perf_counter() - started
+        log(f"  {counts['rows']} baris, {counts['imported']} entri "
+            f"({counts['rows'] / elapsed if elapsed > 0 else 0:.0f} baris/detik)")
+
+    if counts["imported"] and not dry_run:
+        store.compact(user_id)
+
+    for topping, count in unknown_toppings.most_common():
+        log(f"  topping tidak dikenal (tidak dihitung): {topping} x{count}")
+    counts["seconds"] = time.perf_counter() - started
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("csv", help="file CSV lama (mis. riwayat_pengguna.csv)")
+    parser.add_argument("--user-id", required=True, help="user tujuan impor")
+    parser.add_argument("--name", help="nama profil jika user belum ada")
+    parser.add_argument("--data-folder", default="glucoffee_users",
+                        help="folder data user (DATA_FOLDER di app.py)")
+    parser.add_argument("--storage", choices=["sqlite", "json"],
+                        help="backend data user (default: GLUCOFFEE_STORAGE atau sqlite)")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="jumlah baris per batch insert")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="parse dan petakan saja, tanpa menulis ke store")
+    args = parser.parse_args(argv)
+
+    store = get_store(args.data_folder, args.storage)
+    counts = import_csv(args.csv, store, args.user_id, args.name,
+                        max(1, args.batch_size), args.dry_run)
+    mode = " (dry run, tidak ada yang ditulis)" if args.dry_run else ""
+    print(f"Selesai dalam {counts['seconds']:.2f}s{mode}: {counts['rows']} baris, "
+          f"{counts['imported']} diimpor, {counts['duplicate']} duplikat, "
+          f"{counts['invalid']} tidak valid", file=sys.stderr)
+    return 1 if counts["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""Import modul berat hanya saat pertama kali dipakai.
+
+Contoh:
+    genai = lazy_module("google.generativeai")
+    genai.configure(...)   # modul baru di-import di baris ini
+
+Dipakai untuk google.generativeai dan numpy, supaya halaman yang tidak
+memerlukannya (Home, Tes FINDRISC) tidak membayar biaya import saat
+cold start.
+"""
+import importlib
+import sys
+
+
+class LazyModule:
+    """Proxy modul yang meng-import modul aslinya saat atribut pertama diakses"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_module(name):
+    """Proxy lazy untuk modul `name`, atau modulnya langsung jika sudah di-import"""
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
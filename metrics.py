@@ -0,0 +1,295 @@
+"""Metrik ringan GluCoffee: timing span, counter, dan export format Prometheus.
+
+Kode di jalur panas cukup membungkus pekerjaannya dengan span:
+
+    with METRICS.span("load_data"):
+        data = store.load(user_id)
+
+    METRICS.inc("glucoffee_cache_requests_total", cache="recommendation", result="hit")
+
+Durasi span masuk ke histogram `glucoffee_span_seconds{span="..."}`. Mencatat
+satu span hanya perlu perf_counter dan satu lock, jadi selalu aktif. Statistik
+yang sudah dikumpulkan modul lain (OUTCOMES, REQUEST_GATE, IN_FLIGHT, TOKENS,
+cache chart) ikut dibaca saat metrik di-render, tanpa meng-import modul yang
+belum dimuat.
+
+Export diaktifkan lewat environment variable, dimulai sekali per proses oleh
+start_exporters():
+
+- GLUCOFFEE_METRICS_FILE      : file teks Prometheus yang ditulis ulang setiap
+                                GLUCOFFEE_METRICS_INTERVAL detik (default 15),
+                                untuk textfile collector node_exporter
+- GLUCOFFEE_METRICS_PORT      : endpoint http://GLUCOFFEE_METRICS_HOST:PORT/metrics
+                                (host default 127.0.0.1)
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILE = os.getenv("GLUCOFFEE_METRICS_FILE")
+METRICS_INTERVAL = float(os.getenv("GLUCOFFEE_METRICS_INTERVAL", "15"))
+METRICS_PORT = os.getenv("GLUCOFFEE_METRICS_PORT")
+METRICS_HOST = os.getenv("GLUCOFFEE_METRICS_HOST", "127.0.0.1")
+
+# Batas atas bucket histogram (detik), dari operasi disk cepat sampai panggilan AI
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "glucoffee_span_seconds": "Durasi operasi di jalur panas rerun",
+    "glucoffee_cache_requests_total": "Permintaan cache menurut hasil (hit/miss/stale)",
+    "glucoffee_ai_request_seconds": "Latensi request AI per model (streaming: sampai potongan pertama)",
+    "glucoffee_ai_errors_total": "Request AI yang gagal per model dan jenis error",
+}
+
+
+def _labels_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Histogram kumulatif ala Prometheus (tidak thread-safe; dijaga lock registry)"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[index] += 1
+                break
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for upper, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{name}_bucket{_format_labels(labels, [('le', _format_value(upper))])} {cumulative}"
+        yield f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {self.count}"
+        yield f"{name}_sum{_format_labels(labels)} {self.sum!r}"
+        yield f"{name}_count{_format_labels(labels)} {self.count}"
+
+
+class MetricsRegistry:
+    """Counter dan histogram per (nama, label), plus collector untuk gauge"""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Catat durasi blok ke glucoffee_span_seconds, juga jika blok melempar error"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("glucoffee_span_seconds", time.perf_counter() - started, span=name, **labels)
+
+    def register_collector(self, collector):
+        """`collector()` mengembalikan iterable (nama, label dict, nilai) untuk gauge"""
+        with self._lock:
+            self.collectors.append(collector)
+
+    def render(self):
+        """Semua metrik dalam format teks Prometheus"""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.count, h.sum)) for key, h in self.histograms.items()
+            )
+            collectors = list(self.collectors)
+
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), (counts, count, total) in histograms:
+            header(name, "histogram")
+            histogram = Histogram()
+            histogram.counts, histogram.count, histogram.sum = counts, count, total
+            lines.extend(histogram.lines(name, labels))
+
+        gauges = []
+        for collector in collectors:
+            try:
+                gauges.extend(collector())
+            except Exception as e:
+                logger.warning("collector metrik gagal: %s", e)
+        for name, labels, value in sorted(gauges, key=lambda item: (item[0], _labels_key(item[1]))):
+            if value is None:
+                continue
+            header(name, "gauge")
+            lines.append(f"{name}{_format_labels(_labels_key(labels))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+def collect_app_stats():
+    """Gauge dari statistik yang sudah ada di modul AI dan chart
+
+    Modul yang belum di-import dilewati, jadi render metrik tidak pernah
+    memicu import berat (mis. SDK Gemini atau matplotlib).
+    """
+    ai_budget = sys.modules.get("ai_budget")
+    if ai_budget is not None:
+        for outcome, summary in ai_budget.OUTCOMES.summary().items():
+            yield "glucoffee_ai_outcomes", {"outcome": outcome}, summary["count"]
+            yield "glucoffee_ai_first_text_seconds", {"outcome": outcome, "quantile": "0.5"}, summary["p50"]
+            yield "glucoffee_ai_first_text_seconds", {"outcome": outcome, "quantile": "0.95"}, summary["p95"]
+
+    ai_client = sys.modules.get("ai_client")
+    if ai_client is not None:
+        for key, value in ai_client.REQUEST_GATE.stats().items():
+            yield f"glucoffee_ai_gate_{key}", {}, value
+
+    ai_stream = sys.modules.get("ai_stream")
+    if ai_stream is not None:
+        for key, value in ai_stream.IN_FLIGHT.stats().items():
+            yield f"glucoffee_ai_single_flight_{key}", {}, value
+
+    ai_prompt = sys.modules.get("ai_prompt")
+    if ai_prompt is not None:
+        for key, value in ai_prompt.TOKENS.totals.items():
+            yield f"glucoffee_ai_token_report_{key}", {}, value
+
+    charts = sys.modules.get("charts")
+    if charts is not None:
+        info = charts._render_png.cache_info()
+        yield "glucoffee_chart_cache_hits", {}, info.hits
+        yield "glucoffee_chart_cache_misses", {}, info.misses
+        yield "glucoffee_chart_cache_size", {}, info.currsize
+
+
+METRICS.register_collector(collect_app_stats)
+
+
+def write_metrics_file(path, registry=METRICS):
+    """Tulis metrik ke `path` secara atomik (file sementara lalu rename)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+class MetricsFileWriter(threading.Thread):
+    """Thread background yang menulis ulang file metrik setiap `interval` detik"""
+
+    def __init__(self, path, interval=METRICS_INTERVAL, registry=METRICS):
+        super().__init__(daemon=True, name="glucoffee-metrics-file")
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._done = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                write_metrics_file(self.path, self.registry)
+            except OSError as e:
+                logger.warning("gagal menulis file metrik %s: %s", self.path, e)
+            if self._done.wait(self.interval):
+                return
+
+    def stop(self):
+        self._done.set()
+
+
+def serve_metrics(port, host=METRICS_HOST, registry=METRICS):
+    """Endpoint /metrics di thread background; return server-nya"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("metrics: " + format, *args)
+
+    server = ThreadingHTTPServer((host, int(port)), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="glucoffee-metrics-http").start()
+    return server
+
+
+_exporters = None
+_exporters_lock = threading.Lock()
+
+
+def start_exporters():
+    """Mulai export sesuai environment, sekali per proses; return dict exporter yang aktif"""
+    global _exporters
+    with _exporters_lock:
+        if _exporters is not None:
+            return _exporters
+        _exporters = {}
+        if METRICS_FILE:
+            _exporters["file"] = MetricsFileWriter(METRICS_FILE)
+            _exporters["file"].start()
+        if METRICS_PORT:
+            try:
+                _exporters["http"] = serve_metrics(METRICS_PORT)
+            except OSError as e:
+                # Port bisa sudah dipakai proses lain (mis. beberapa replika di satu host)
+                logger.warning("endpoint metrik di port %s tidak bisa dibuka: %s", METRICS_PORT, e)
+        return _exporters
@@ -0,0 +1,117 @@
+"""Pre-warm cache rekomendasi AI untuk semua user yang tersimpan.
+
+Contoh:
+    python prewarm_ai.py --concurrency 4 --rate 30
+
+Script ini membaca semua user dari store data (SQLite atau file JSON),
+menyusun prompt yang sama persis dengan halaman Hasil Analisis, lalu
+menyimpan jawaban Gemini ke cache rekomendasi. User yang jawabannya masih segar di cache dilewati, jadi job
+yang terhenti cukup dijalankan ulang untuk melanjutkan.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from ai_cache import RecommendationCache, recommendation_key
+from ai_cassette import AI_MODE
+from ai_client import RequestGate, create_model, get_api_key
+from recommenders import GeminiBackend
+from storage import get_store
+from sugar_stats import daily_sugar, weekly_average
+
+
+def needs_recommendation(data):
+    """Sama dengan syarat halaman analisis: ada profil dan minimal satu jenis data"""
+    has_findrisc = data['findrisc']['score'] is not None
+    has_coffee = len(data['coffee_history']) > 0
+    return bool(data['user_profile']['name']) and (has_findrisc or has_coffee)
+
+
+def prewarm_user(store, user_id, backend, cache, force=False):
+    """Proses satu user; return (status, detik)"""
+    started = time.perf_counter()
+    data = store.load(user_id)
+    if data is None or not needs_recommendation(data):
+        return "skip-empty", time.perf_counter() - started
+
+    has_coffee = len(data['coffee_history']) > 0
+    today_sugar = daily_sugar(data) if has_coffee else 0
+    weekly_avg = weekly_average(data) if has_coffee else 0
+    key = recommendation_key(data, today_sugar, weekly_avg)
+    if not force and cache.get(key) is not None:
+        return "skip-cached", time.perf_counter() - started
+
+    cache.put(key, backend.recommend(data, today_sugar, weekly_avg))
+    return "ok", time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-folder", default="glucoffee_users",
+                        help="folder data user (DATA_FOLDER di app.py)")
+    parser.add_argument("--storage", choices=["sqlite", "json"],
+                        help="backend data user (default: GLUCOFFEE_STORAGE atau sqlite)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="jumlah request Gemini paralel maksimum")
+    parser.add_argument("--rate", type=float, default=30,
+                        help="batas request per menit")
+    parser.add_argument("--force", action="store_true",
+                        help="panggil ulang AI walaupun cache masih segar")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="hanya hitung user yang akan diproses")
+    args = parser.parse_args(argv)
+
+    store = get_store(args.data_folder, args.storage)
+    user_ids = store.user_ids()
+    cache = RecommendationCache(os.path.join(args.data_folder, "ai_cache"))
+    print(f"{len(user_ids)} user ditemukan di {args.data_folder}", file=sys.stderr)
+    if args.dry_run or not user_ids:
+        return 0
+
+    load_dotenv()
+    api_key = get_api_key()
+    if not api_key and AI_MODE != "replay":
+        print("API Key tidak ditemukan! Set GEMINI_API_KEY atau GOOGLE_API_KEY", file=sys.stderr)
+        return 1
+    # Gate sendiri dengan batas dari argumen; konkurensi dan rate ditegakkan di router
+    model = create_model(api_key, probe=False, gate=RequestGate(args.concurrency, args.rate))
+    if model is None:
+        print("Model AI tidak dapat dimuat. Periksa API key Anda.", file=sys.stderr)
+        return 1
+    # Ukur kesehatan model dulu supaya batch langsung memakai model tercepat
+    model.probe()
+    for stats in model.snapshot():
+        latency = f"{stats['latency_seconds']:.2f}s" if stats['latency_seconds'] is not None else "-"
+        print(f"  model {stats['model']}: {stats['state']}, latensi {latency}", file=sys.stderr)
+
+    backend = GeminiBackend(model)
+    counts = {}
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = {
+            pool.submit(prewarm_user, store, user_id, backend, cache, args.force): user_id
+            for user_id in user_ids
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            user_id = futures[future]
+            try:
+                status, elapsed = future.result()
+            except Exception as e:
+                status, elapsed = "error", 0.0
+                print(f"  {user_id}: {e}", file=sys.stderr)
+            counts[status] = counts.get(status, 0) + 1
+            print(f"[{done}/{len(user_ids)}] {user_id}: {status} ({elapsed:.1f}s)",
+                  file=sys.stderr)
+
+    summary = ", ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+    print(f"Selesai dalam {time.perf_counter() - started:.1f}s: {summary}", file=sys.stderr)
+    return 1 if counts.get("error") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""Profiling per rerun, opt-in, untuk menyelidiki halaman yang lambat.
+
+Profiling aktif jika salah satu terpenuhi:
+
+- GLUCOFFEE_PROFILE=1              : semua rerun di proses ini diprofile
+- GLUCOFFEE_PROFILE_TOKEN=<rahasia> : rerun dengan query parameter
+                                     `?profile=<rahasia>` diprofile; hanya
+                                     admin yang tahu token-nya
+
+Setiap rerun yang diprofile menulis satu file ke GLUCOFFEE_PROFILE_DIR
+(default glucoffee_profiles), dengan nama berisi waktu, halaman, jumlah entri
+riwayat, dan durasi rerun:
+
+    20261017-101502-123_analysis_h10000_850ms_4121_7.pstats
+
+GLUCOFFEE_PROFILE_MODE memilih profiler:
+
+- cprofile (default) : deterministik, file .pstats (snakeviz, pstats)
+- sample             : sampling stack thread script setiap
+                       GLUCOFFEE_PROFILE_INTERVAL detik (default 0.005),
+                       file .collapsed (format flamegraph.pl / speedscope)
+
+Hanya GLUCOFFEE_PROFILE_KEEP file terbaru (default 200) yang disimpan.
+Ringkasan beberapa profile sekaligus:
+
+    python profiling.py top --page analysis --limit 30
+"""
+import argparse
+import cProfile
+import glob
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from itertools import count
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ALL = os.getenv("GLUCOFFEE_PROFILE", "0") == "1"
+PROFILE_TOKEN = os.getenv("GLUCOFFEE_PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("GLUCOFFEE_PROFILE_DIR", "glucoffee_profiles")
+PROFILE_MODE = os.getenv("GLUCOFFEE_PROFILE_MODE", "cprofile")
+PROFILE_INTERVAL = float(os.getenv("GLUCOFFEE_PROFILE_INTERVAL", "0.005"))
+PROFILE_KEEP = int(os.getenv("GLUCOFFEE_PROFILE_KEEP", "200"))
+
+EXTENSIONS = {"cprofile": ".pstats", "sample": ".collapsed"}
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_-]+")
+_sequence = count(1)
+
+
+def profiling_requested(token=None):
+    """True jika rerun ini perlu diprofile (env global atau token admin yang cocok)"""
+    if PROFILE_ALL:
+        return True
+    if not PROFILE_TOKEN or not token:
+        return False
+    return hmac.compare_digest(str(token), PROFILE_TOKEN)
+
+
+class StackSampler(threading.Thread):
+    """Sampling stack satu thread secara berkala, dihitung sebagai collapsed stack"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        super().__init__(daemon=True, name="glucoffee-profile-sampler")
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                # Baris awal fungsi (bukan baris aktif) supaya sampel satu fungsi tergabung
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, samples in self.stacks.most_common():
+                f.write(f"{stack} {samples}\n")
+
+
+def profile_path(folder, page, history_size, elapsed, mode):
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+    page = _SAFE_NAME.sub("_", str(page))
+    name = f"{stamp}_{page}_h{history_size}_{elapsed * 1000:.0f}ms_{os.getpid()}_{next(_sequence)}"
+    return os.path.join(folder, name + EXTENSIONS[mode])
+
+
+def prune(folder, keep=PROFILE_KEEP):
+    """Hapus file profile terlama sampai tersisa `keep` file"""
+    paths = []
+    for extension in EXTENSIONS.values():
+        paths.extend(glob.glob(os.path.join(folder, "*" + extension)))
+    if len(paths) <= keep:
+        return 0
+    paths.sort(key=lambda path: os.path.basename(path))
+    removed = 0
+    for path in paths[:len(paths) - keep]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+@contextmanager
+def profile_rerun(page, history_size, enabled=True, folder=PROFILE_DIR, mode=PROFILE_MODE):
+    """Profile blok (satu dispatch halaman) dan tulis hasilnya, juga saat st.stop()/st.rerun()"""
+    if not enabled:
+        yield
+        return
+    if mode not in EXTENSIONS:
+        logger.warning("GLUCOFFEE_PROFILE_MODE tidak dikenal: %s", mode)
+        yield
+        return
+
+    profiler = sampler = None
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Python 3.12+: hanya satu cProfile aktif per proses
+            logger.info("profile rerun dilewati: %s", e)
+            profiler = None
+        if profiler is None:
+            yield
+            return
+    else:
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if profiler is not None:
+            profiler.disable()
+        else:
+            sampler.stop()
+        try:
+            os.makedirs(folder, exist_ok=True)
+            path = profile_path(folder, page, history_size, elapsed, mode)
+            if profiler is not None:
+                profiler.dump_stats(path)
+            else:
+                sampler.write(path)
+            prune(folder)
+        except OSError as e:
+            logger.warning("gagal menulis profile ke %s: %s", folder, e)
+
+
+def parse_name(path):
+    """(halaman, jumlah riwayat, durasi ms) dari nama file profile, atau None"""
+    match = re.match(r"\d{8}-\d{6}-\d{3}_(.+)_h(\d+)_(\d+)ms_", os.path.basename(path))
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2)), int(match.group(3))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ringkasan profile rerun GluCoffee")
+    sub = parser.add_subparsers(dest="command", required=True)
+    top = sub.add_parser("top", help="fungsi terberat dari gabungan file .pstats")
+    top.add_argument("--dir", default=PROFILE_DIR)
+    top.add_argument("--page", help="hanya profile halaman ini")
+    top.add_argument("--sort", default="cumulative", help="kolom urutan pstats (cumulative, tottime, ...)")
+    top.add_argument("--limit", type=int, default=25)
+    args = parser.parse_args(argv)
+
+    import pstats
+
+    paths = sorted(glob.glob(os.path.join(args.dir, "*.pstats")))
+    if args.page:
+        paths = [path for path in paths if (parse_name(path) or (None,))[0] == args.page]
+    if not paths:
+        print(f"Tidak ada file .pstats di {args.dir}", file=sys.stderr)
+        return 1
+
+    durations = sorted(info[2] for info in map(parse_name, paths) if info)
+    if durations:
+        print(f"{len(paths)} rerun, durasi median {durations[len(durations) // 2]}ms, "
+              f"maks {durations[-1]}ms", file=sys.stderr)
+    stats = pstats.Stats(*paths, stream=sys.stdout)
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.limit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""Backend rekomendasi personal untuk halaman Hasil Analisis.
+
+Setiap backend menerima dokumen user, gula hari ini, dan rata-rata mingguan,
+lalu mengembalikan teks markdown dengan enam bagian yang sama dengan TUGAS di
+prompt AI (sapaan, analisis, meal plan, tips kopi, action plan, motivasi).
+
+- GeminiBackend: prompt dari ai_prompt ke model/router Gemini. `remote=True`,
+  jadi app.py menjalankannya lewat job streaming, cache, dan latency budget.
+- RuleBasedBackend: aturan lokal yang deterministik, tanpa jaringan dan
+  selesai dalam waktu kurang dari satu milidetik. Dipakai sebagai fallback
+  instan saat AI gagal atau lambat, atau sebagai backend utama
+  (GLUCOFFEE_RECOMMENDER=rules) saat trafik tinggi.
+"""
+import abc
+
+from ai_prompt import TOKEN_REPORT, TOKENS, build_prompt, generation_config
+from coffee_catalog import COFFEE_DATABASE, lower_sugar_drinks
+from sugar_stats import DAILY_LIMIT, ensure_rollups, window_days
+
+
+class RecommendationBackend(abc.ABC):
+    """Antarmuka backend rekomendasi"""
+
+    name = None
+    # True jika backend memanggil layanan di luar proses (perlu cache dan batas waktu)
+    remote = False
+
+    @abc.abstractmethod
+    def recommend(self, data, today_sugar, weekly_avg):
+        """Teks rekomendasi markdown untuk user"""
+
+
+class GeminiBackend(RecommendationBackend):
+    """Rekomendasi dari Gemini (GenerativeModel atau ModelRouter)"""
+
+    name = "gemini"
+    remote = True
+
+    def __init__(self, model):
+        self.model = model
+
+    def prompt(self, data, today_sugar, weekly_avg):
+        return build_prompt(data, today_sugar, weekly_avg)
+
+    def recommend(self, data, today_sugar, weekly_avg):
+        prompt = self.prompt(data, today_sugar, weekly_avg)
+        response = self.model.generate_content(prompt, generation_config=generation_config("analysis"))
+        if TOKEN_REPORT:
+            TOKENS.report(self.model, prompt, response.text, getattr(response, "usage_metadata", None))
+        return response.text
+
+
+# Catatan per tingkat risiko FINDRISC (kalimat analisis, langkah hari ke-3, motivasi)
+RISK_NOTES = {
+    "Rendah": (
+        "Risiko diabetes Anda **rendah**, modal yang bagus untuk dijaga.",
+        "Pertahankan aktivitas fisik minimal 30 menit hari ini.",
+        "Kebiasaan baik Anda sudah berjalan, tinggal dijaga konsisten. Terus semangat! 🌟",
+    ),
+    "Sedikit Meningkat": (
+        "Risiko diabetes Anda **sedikit meningkat**, jadi pola makan mulai perlu diperhatikan.",
+        "Jalan kaki 30 menit dan catat semua minuman manis hari ini.",
+        "Perubahan kecil yang konsisten jauh lebih berarti daripada perubahan besar sesaat. Anda pasti bisa! 💪",
+    ),
+    "Sedang": (
+        "Risiko diabetes Anda **sedang**. Mengendalikan gula tambahan adalah langkah paling efektif saat ini.",
+        "Jadwalkan konsultasi dengan dokter untuk membahas hasil FINDRISC Anda.",
+        "Setiap gelas kopi yang lebih rendah gula adalah investasi untuk kesehatan Anda. Ayo mulai hari ini! 💪",
+    ),
+    "Tinggi": (
+        "Risiko diabetes Anda **tinggi**. Asupan gula tambahan sebaiknya ditekan serendah mungkin.",
+        "Lakukan pemeriksaan gula darah (puasa atau HbA1c) di fasilitas kesehatan.",
+        "Mengetahui risiko lebih awal adalah keuntungan. Dengan langkah yang tepat, risiko bisa diturunkan. Tetap semangat! 🌱",
+    ),
+    "Sangat Tinggi": (
+        "Risiko diabetes Anda **sangat tinggi**. Batasi gula tambahan seketat mungkin dan libatkan dokter.",
+        "Segera konsultasikan hasil FINDRISC Anda dengan dokter dan periksa gula darah.",
+        "Anda tidak sendirian. Langkah kecil yang dimulai hari ini, bersama dokter, akan membuat perbedaan besar. 🤝",
+    ),
+}
+NO_FINDRISC_NOTES = (
+    "Anda belum mengisi tes FINDRISC, jadi analisis risiko diabetes belum bisa dilakukan.",
+    "Isi tes FINDRISC di GluCoffee untuk mengetahui risiko diabetes Anda.",
+    "Mengenal risiko adalah langkah pertama untuk hidup lebih sehat. Yuk, lanjutkan! ☕",
+)
+
+
+class RuleBasedBackend(RecommendationBackend):
+    """Rekomendasi deterministik dari skor FINDRISC, gula, dan katalog kopi"""
+
+    name = "rules"
+
+    def recommend(self, data, today_sugar, weekly_avg):
+        has_findrisc = data['findrisc']['score'] is not None
+        has_coffee = len(data['coffee_history']) > 0
+        notes = RISK_NOTES.get(data['findrisc']['risk_level'], NO_FINDRISC_NOTES) if has_findrisc else NO_FINDRISC_NOTES
+        sisa = max(0, DAILY_LIMIT - today_sugar)
+        favorite = self._favorite_drink(data) if has_coffee else None
+
+        sections = [
+            self._greeting(data, has_coffee, today_sugar),
+            self._analysis(data, has_findrisc, has_coffee, today_sugar, weekly_avg, notes),
+            self._meal_plan(has_coffee, sisa),
+            self._coffee_tips(favorite, sisa),
+            self._action_plan(has_coffee, weekly_avg, today_sugar, notes),
+            f"#### 6. Motivasi 💪\n\n{notes[2]}",
+        ]
+        return "\n\n".join(sections)
+
+    @staticmethod
+    def _favorite_drink(data, days=7):
+        """Minuman dengan jumlah gelas terbanyak dalam `days` hari terakhir"""
+        rollup = ensure_rollups(data)
+        cups = {}
+        for day in window_days(days):
+            for drink, count in rollup.get(day, {}).get('drinks', {}).items():
+                cups[drink] = cups.get(drink, 0) + count
+        if not cups:
+            return None
+        return max(sorted(cups), key=lambda drink: cups[drink])
+
+    @staticmethod
+    def _greeting(data, has_coffee, today_sugar):
+        name = data['user_profile']['name'] or "Sahabat GluCoffee"
+        if not has_coffee:
+            status = "Belum ada kopi yang tercatat, jadi mari mulai dengan data yang ada."
+        elif today_sugar == 0:
+            status = "Hari ini Anda belum mengonsumsi gula dari kopi. Awal yang bagus!"
+        elif today_sugar <= DAILY_LIMIT:
+            status = f"Hari ini Anda sudah mengonsumsi **{today_sugar:.1f}g** gula dari kopi."
+        else:
+            status = f"Hari ini gula dari kopi sudah **{today_sugar:.1f}g**, melewati batas {DAILY_LIMIT}g."
+        return f"#### 1. Halo, {name}! 👋\n\n{status}"
+
+    @staticmethod
+    def _analysis(data, has_findrisc, has_coffee, today_sugar, weekly_avg, notes):
+        lines = ["#### 2. Analisis Risiko & Pola Konsumsi Gula 🔍", ""]
+        if has_findrisc:
+            lines.append(f"- Skor FINDRISC Anda **{data['findrisc']['score']}** poin. {notes[0]}")
+        else:
+            lines.append(f"- {notes[0]}")
+        if has_coffee:
+            usage = today_sugar / DAILY_LIMIT * 100
+            lines.append(f"- Gula hari ini memakai **{usage:.0f}%** dari batas harian WHO ({DAILY_LIMIT}g).")
+            if weekly_avg > DAILY_LIMIT:
+                lines.append(f"- Rata-rata 7 hari **{weekly_avg:.1f}g/hari** berada di atas batas; ini yang paling perlu diturunkan.")
+            elif weekly_avg > DAILY_LIMIT * 0.7:
+                lines.append(f"- Rata-rata 7 hari **{weekly_avg:.1f}g/hari** masih aman, tetapi cukup dekat dengan batas.")
+            else:
+                lines.append(f"- Rata-rata 7 hari **{weekly_avg:.1f}g/hari** terkendali dengan baik.")
+            if has_findrisc and data['findrisc']['score'] >= 12 and weekly_avg > DAILY_LIMIT * 0.7:
+                lines.append("- Kombinasi risiko FINDRISC dan konsumsi gula Anda perlu perhatian lebih.")
+        else:
+            lines.append("- Catat konsumsi kopi Anda agar pola gula harian bisa dianalisis.")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _meal_plan(has_coffee, sisa):
+        lines = ["#### 3. Meal Plan Hari Ini 🍽️", ""]
+        if has_coffee:
+            lines.append(f"Sisa kuota gula tambahan hari ini: **{sisa:.1f}g**.")
+            lines.append("")
+        lines.append("- **Sarapan:** oatmeal atau roti gandum dengan telur, tanpa selai manis.")
+        lines.append("- **Makan siang:** nasi porsi kecil, lauk protein, dan setengah piring sayur.")
+        lines.append("- **Makan malam:** ikan atau tahu-tempe dengan sayur, hindari makanan bersaus manis.")
+        if sisa <= 0:
+            lines.append("- **Camilan & minuman:** kuota habis; pilih buah utuh, kacang, dan air putih tanpa gula tambahan.")
+        elif sisa < 15:
+            lines.append(f"- **Camilan & minuman:** sisa {sisa:.1f}g cukup untuk satu camilan kecil; utamakan air putih.")
+        else:
+            lines.append(f"- **Camilan & minuman:** gunakan sisa {sisa:.1f}g dengan bijak, tidak perlu dihabiskan.")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _coffee_tips(favorite, sisa):
+        lines = ["#### 4. Tips Memilih Kopi ☕", ""]
+        favorite_sugar = COFFEE_DATABASE.get(favorite)
+        if favorite_sugar:
+            options = lower_sugar_drinks(favorite_sugar)
+            lines.append(f"- Minuman favorit Anda minggu ini, **{favorite}**, mengandung ±{favorite_sugar:.1f}g gula per gelas reguler.")
+            if options:
+                lines.append(f"- Alternatif lebih rendah gula: {', '.join(options)}.")
+        else:
+            lines.append(f"- Pilihan paling rendah gula: {', '.join(lower_sugar_drinks(DAILY_LIMIT))}.")
+        if sisa > 0:
+            # +0.05: nilai gula dibandingkan pada pembulatan 0.1g yang ditampilkan
+            fitting = lower_sugar_drinks(sisa + 0.05)
+            lines.append(f"- Yang masih muat dalam sisa kuota hari ini: {', '.join(fitting)}.")
+        lines.append("- Pilih ukuran reguler dan minta less sugar; ukuran large menambah gula sekitar 35%.")
+        lines.append("- Lewati topping manis seperti caramel atau brown sugar jelly (±5g per topping).")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _action_plan(has_coffee, weekly_avg, today_sugar, notes):
+        lines = ["#### 5. Action Plan 3 Hari ke Depan 📅", ""]
+        base = min(DAILY_LIMIT, weekly_avg or today_sugar) if has_coffee else DAILY_LIMIT / 2
+        targets = [max(10, round(base) - 5 * day) for day in (1, 2, 3)]
+        lines.append(f"- **Hari 1:** target gula dari kopi ≤ {targets[0]}g; ganti satu kopi manis dengan Americano atau kopi tanpa gula.")
+        lines.append(f"- **Hari 2:** target ≤ {targets[1]}g; minum 8 gelas air putih dan kurangi satu topping.")
+        lines.append(f"- **Hari 3:** target ≤ {targets[2]}g. {notes[1]}")
+        return "\n".join(lines)
+
+
+RULES = RuleBasedBackend()
+
+
+def get_backend(name, model=None):
+    """Backend sesuai nama ("gemini" atau "rules"); rule engine jika model tidak tersedia"""
+    if name == "rules" or model is None:
+        return RULES
+    return GeminiBackend(model)
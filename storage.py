@@ -0,0 +1,565 @@
+"""Penyimpanan data user GluCoffee.
+
+Dua backend dengan interface yang sama:
+
+- JsonStore   : satu file JSON per browser (format lama) plus journal
+                append-only untuk entri kopi baru
+- SqliteStore : satu database SQLite (WAL) dengan tabel users,
+                findrisc_results, dan coffee_entries yang di-index pada
+                (user_id, timestamp)
+
+Backend dipilih lewat environment variable GLUCOFFEE_STORAGE ("sqlite" atau
+"json"). SqliteStore otomatis memigrasi file JSON lama milik user saat user
+tersebut pertama kali dimuat; migrasi semua file sekaligus bisa dijalankan
+dengan:
+
+    python storage.py migrate --data-folder glucoffee_users
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: hanya lock antar thread
+    fcntl = None
+
+from sugar_stats import add_to_rollup, ensure_rollups, rebuild_rollups
+
+DB_FILENAME = "glucoffee.db"
+
+# Journal dipadatkan ke snapshot setelah melewati ukuran ini
+JOURNAL_COMPACT_BYTES = 64 * 1024
+
+
+def init_data_structure():
+    """Struktur data awal"""
+    return {
+        "user_profile": {
+            "name": None,
+            "created_at": None
+        },
+        "findrisc": {
+            "score": None,
+            "risk_level": None,
+            "last_updated": None,
+            "raw_answers": {}
+        },
+        "coffee_history": [],
+        "daily_rollup": {}
+    }
+
+
+class JsonStore:
+    """Snapshot JSON per user plus journal append-only
+
+    Mencatat kopi hanya menambah satu baris JSON ke user_<id>.journal.jsonl,
+    sehingga biayanya tetap walaupun riwayat makin panjang. Saat load,
+    snapshot user_<id>.json dibaca lalu journal di-replay. Journal dipadatkan
+    ke snapshot setiap kali save() dipanggil atau ukurannya melewati
+    JOURNAL_COMPACT_BYTES.
+
+    Semua akses ke file satu user dijaga lock per user: lock thread di proses
+    ini plus flock pada user_<id>.lock (jika tersedia) untuk proses lain.
+    Setiap event journal punya id unik; id event yang sudah dipadatkan
+    dicatat di snapshot supaya tidak di-replay dua kali jika proses mati
+    sebelum journal dihapus.
+    """
+
+    def __init__(self, folder, compact_bytes=JOURNAL_COMPACT_BYTES):
+        self.folder = folder
+        self.compact_bytes = compact_bytes
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        # (user_id, stempel file, set (tanggal, minuman)) terakhir untuk existing_keys
+        self._keys = None
+        os.makedirs(folder, exist_ok=True)
+
+    def user_file(self, user_id):
+        return os.path.join(self.folder, f"user_{user_id}.json")
+
+    def journal_file(self, user_id):
+        return os.path.join(self.folder, f"user_{user_id}.journal.jsonl")
+
+    def lock_file(self, user_id):
+        return os.path.join(self.folder, f"user_{user_id}.lock")
+
+    def user_ids(self):
+        pattern = os.path.join(self.folder, "user_*.json")
+        return sorted(
+            os.path.basename(path)[len("user_"):-len(".json")]
+            for path in glob.glob(pattern)
+        )
+
+    @contextmanager
+    def _user_lock(self, user_id):
+        with self._locks_guard:
+            lock = self._locks.setdefault(user_id, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_file(user_id), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load(self, user_id):
+        """Dokumen user (snapshot + journal), atau None jika belum ada / rusak"""
+        if not os.path.exists(self.user_file(user_id)):
+            return None
+        with self._user_lock(user_id):
+            data, _ = self._read(user_id)
+        return data
+
+    def _read(self, user_id):
+        """(dokumen, id semua event di journal); lock user harus sudah dipegang"""
+        try:
+            with open(self.user_file(user_id), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None, []
+        compacted = set(data.pop('journal_ids', ()))
+        ensure_rollups(data)
+        return data, self._replay_journal(user_id, data, compacted)
+
+    def _replay_journal(self, user_id, data, compacted):
+        history = data['coffee_history']
+        event_ids = []
+        try:
+            f = open(self.journal_file(user_id), 'r', encoding='utf-8')
+        except OSError:
+            return event_ids
+        with f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # Baris bisa terpotong jika proses mati saat menulis
+                    continue
+                if event['op'] != "add_coffee":
+                    continue
+                event_id = event.get('id')
+                if event_id is None:
+                    # Journal format lama: `n` = panjang riwayat setelah entri ditambahkan
+                    if event['n'] <= len(history):
+                        continue
+                else:
+                    event_ids.append(event_id)
+                    if event_id in compacted:
+                        continue
+                history.append(event['entry'])
+                add_to_rollup(data, event['entry'])
+        return event_ids
+
+    def save(self, user_id, data):
+        """Tulis snapshot lengkap lalu kosongkan journal (compaction)
+
+        Entri di store yang tidak ada di `data` (ditambahkan session lain
+        setelah `data` dimuat) tetap disimpan, jadi dokumen basi tidak
+        menghapus entri yang lebih baru.
+        """
+        with self._user_lock(user_id):
+            self._compact(user_id, data)
+
+    def _compact(self, user_id, data):
+        stored, event_ids = self._read(user_id)
+        if stored is not None:
+            data = _merge_history(data, stored)
+        if data is not None:
+            self._write_snapshot(user_id, data, event_ids)
+
+    def _write_snapshot(self, user_id, data, event_ids=()):
+        path = self.user_file(user_id)
+        # Nama unik per proses dan thread, seperti RecommendationCache.put
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        snapshot = dict(data, journal_ids=list(event_ids)) if event_ids else data
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        try:
+            os.remove(self.journal_file(user_id))
+        except OSError:
+            pass
+
+    def reset_history(self, user_id):
+        """Hapus riwayat kopi dan hasil FINDRISC user (tombol Reset Semua Data)"""
+        with self._user_lock(user_id):
+            data, _ = self._read(user_id)
+            if data is None:
+                return
+            reset = init_data_structure()
+            reset['user_profile'] = data['user_profile']
+            self._write_snapshot(user_id, reset)
+
+    def add_coffee(self, user_id, data, entry):
+        """Tambah satu baris ke journal (`entry` sudah ada di data['coffee_history'])"""
+        self.add_coffee_batch(user_id, data, [entry])
+
+    def add_coffee_batch(self, user_id, data, entries, compact=True):
+        """Tambah beberapa baris ke journal dalam satu write (entri terakhir di history)
+
+        Dengan `compact=False` journal tidak dipadatkan walaupun melewati
+        batas ukuran; pemanggil (mis. impor massal) memanggil compact() sekali
+        di akhir.
+        """
+        lines = "".join(
+            json.dumps({"op": "add_coffee", "id": uuid.uuid4().hex, "entry": entry},
+                       ensure_ascii=False, separators=(',', ':')) + "\n"
+            for entry in entries
+        )
+        with self._user_lock(user_id):
+            stamp = self._stamp(user_id)
+            with open(self.journal_file(user_id), 'a', encoding='utf-8') as f:
+                f.write(lines)
+                size = f.tell()
+            if self._keys is not None and self._keys[:2] == (user_id, stamp):
+                self._keys[2].update((entry['date'], entry['drink']) for entry in entries)
+                self._keys = (user_id, self._stamp(user_id), self._keys[2])
+            if compact and size >= self.compact_bytes:
+                self._compact(user_id, data)
+
+    def compact(self, user_id):
+        """Padatkan journal ke snapshot"""
+        with self._user_lock(user_id):
+            self._compact(user_id, None)
+
+    def existing_keys(self, user_id, keys):
+        """Bagian dari `keys` (tanggal, minuman) yang sudah ada di riwayat user
+
+        Key riwayat satu user terakhir disimpan dan diperbarui oleh
+        add_coffee_batch, jadi impor per batch tidak membaca ulang journal.
+        """
+        if not os.path.exists(self.user_file(user_id)):
+            return set()
+        with self._user_lock(user_id):
+            stamp = self._stamp(user_id)
+            if self._keys is None or self._keys[:2] != (user_id, stamp):
+                data, _ = self._read(user_id)
+                history = data['coffee_history'] if data is not None else []
+                self._keys = (user_id, stamp, {(entry['date'], entry['drink']) for entry in history})
+            stored = self._keys[2]
+        return {key for key in keys if key in stored}
+
+    def _stamp(self, user_id):
+        """Penanda perubahan snapshot dan journal (mtime dan ukuran)"""
+        stamp = []
+        for path in (self.user_file(user_id), self.journal_file(user_id)):
+            try:
+                info = os.stat(path)
+            except OSError:
+                stamp.append(None)
+            else:
+                stamp.append((info.st_mtime_ns, info.st_size))
+        return tuple(stamp)
+
+
+def _merge_history(data, stored):
+    """`data` ditambah entri di `stored` yang tidak ada di riwayat `data`
+
+    Rollup disusun ulang dari riwayat gabungan, jadi snapshot selalu
+    konsisten walaupun rollup di `data` tertinggal dari riwayatnya.
+    """
+    if data is None:
+        return stored
+    known = Counter((entry['date'], entry['drink']) for entry in data['coffee_history'])
+    missing = []
+    for entry in stored['coffee_history']:
+        key = (entry['date'], entry['drink'])
+        if known[key] > 0:
+            known[key] -= 1
+        else:
+            missing.append(entry)
+    merged = dict(data)
+    merged['coffee_history'] = data['coffee_history'] + missing
+    rebuild_rollups(merged)
+    return merged
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id     TEXT PRIMARY KEY,
+    name        TEXT,
+    created_at  TEXT
+);
+
+CREATE TABLE IF NOT EXISTS findrisc_results (
+    id          INTEGER PRIMARY KEY,
+    user_id     TEXT NOT NULL REFERENCES users(user_id),
+    timestamp   TEXT NOT NULL,
+    score       INTEGER NOT NULL,
+    risk_level  TEXT NOT NULL,
+    raw_answers TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_findrisc_user_time
+    ON findrisc_results (user_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS coffee_entries (
+    id          INTEGER PRIMARY KEY,
+    user_id     TEXT NOT NULL REFERENCES users(user_id),
+    timestamp   TEXT NOT NULL,
+    drink       TEXT NOT NULL,
+    volume      TEXT NOT NULL,
+    quantity    INTEGER NOT NULL,
+    topping     TEXT NOT NULL,
+    sugar       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_coffee_user_time
+    ON coffee_entries (user_id, timestamp);
+"""
+
+
+def _entry_row(user_id, entry):
+    return (
+        user_id,
+        entry['date'],
+        entry['drink'],
+        entry['volume'],
+        entry['quantity'],
+        json.dumps(entry['topping'], ensure_ascii=False),
+        entry['sugar'],
+    )
+
+
+def _row_entry(row):
+    return {
+        "date": row[0],
+        "drink": row[1],
+        "volume": row[2],
+        "quantity": row[3],
+        "topping": json.loads(row[4]),
+        "sugar": row[5],
+    }
+
+
+class SqliteStore:
+    """Database SQLite bersama untuk semua user (mode WAL)"""
+
+    def __init__(self, path, legacy_folder=None):
+        self.path = path
+        self.legacy = JsonStore(legacy_folder) if legacy_folder else None
+        # Satu koneksi per proses; akses diserialisasi dengan lock karena
+        # Streamlit menjalankan tiap session di thread berbeda
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.RLock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def user_ids(self):
+        """Semua user di database, termasuk file JSON lama yang belum dimigrasi"""
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id FROM users").fetchall()
+        ids = {row[0] for row in rows}
+        if self.legacy is not None:
+            ids.update(self.legacy.user_ids())
+        return sorted(ids)
+
+    def load(self, user_id):
+        """Dokumen user dalam format yang sama dengan file JSON, atau None"""
+        with self._lock:
+            user = self._conn.execute(
+                "SELECT name, created_at FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if user is None:
+                return self._migrate_legacy(user_id)
+
+            findrisc = self._conn.execute(
+                "SELECT score, risk_level, timestamp, raw_answers FROM findrisc_results "
+                "WHERE user_id = ? ORDER BY timestamp DESC, id DESC LIMIT 1",
+                (user_id,)
+            ).fetchone()
+            rows = self._conn.execute(
+                "SELECT timestamp, drink, volume, quantity, topping, sugar FROM coffee_entries "
+                "WHERE user_id = ? ORDER BY id",
+                (user_id,)
+            ).fetchall()
+
+        data = init_data_structure()
+        data['user_profile'] = {"name": user[0], "created_at": user[1]}
+        if findrisc is not None:
+            data['findrisc'] = {
+                "score": findrisc[0],
+                "risk_level": findrisc[1],
+                "last_updated": findrisc[2],
+                "raw_answers": json.loads(findrisc[3]),
+            }
+        data['coffee_history'] = [_row_entry(row) for row in rows]
+        rebuild_rollups(data)
+        return data
+
+    def _migrate_legacy(self, user_id):
+        if self.legacy is None:
+            return None
+        data = self.legacy.load(user_id)
+        if data is not None:
+            self.save(user_id, data)
+        return data
+
+    def save(self, user_id, data):
+        """Sinkronkan dokumen user ke database dalam satu transaksi
+
+        Profil dan hasil FINDRISC ditimpa; dari riwayat kopi hanya entri yang
+        belum tersimpan (dicocokkan per timestamp dan minuman) yang di-insert.
+        save() tidak pernah menghapus baris, jadi dokumen yang sudah basi
+        (mis. dimuat sebelum tab lain menambah kopi) tidak menghapus entri
+        yang lebih baru. Menghapus data hanya lewat reset_history().
+        """
+        profile = data['user_profile']
+        findrisc = data['findrisc']
+        history = data['coffee_history']
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO users (user_id, name, created_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET "
+                "name = excluded.name, created_at = excluded.created_at",
+                (user_id, profile['name'], profile['created_at'])
+            )
+
+            if findrisc['last_updated'] is not None:
+                # Hasil dengan timestamp yang sama diperbarui (mis. skor dihitung ulang)
+                updated = self._conn.execute(
+                    "UPDATE findrisc_results SET score = ?, risk_level = ?, raw_answers = ? "
+                    "WHERE user_id = ? AND timestamp = ?",
+                    (findrisc['score'], findrisc['risk_level'],
+                     json.dumps(findrisc['raw_answers'], ensure_ascii=False),
+                     user_id, findrisc['last_updated'])
+                ).rowcount
+                if updated == 0:
+                    self._conn.execute(
+                        "INSERT INTO findrisc_results "
+                        "(user_id, timestamp, score, risk_level, raw_answers) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (user_id, findrisc['last_updated'], findrisc['score'],
+                         findrisc['risk_level'],
+                         json.dumps(findrisc['raw_answers'], ensure_ascii=False))
+                    )
+
+            stored = Counter(self._conn.execute(
+                "SELECT timestamp, drink FROM coffee_entries WHERE user_id = ?", (user_id,)
+            ))
+            new_entries = []
+            for entry in history:
+                key = (entry['date'], entry['drink'])
+                if stored[key] > 0:
+                    stored[key] -= 1
+                else:
+                    new_entries.append(entry)
+            self._insert_entries(user_id, new_entries)
+
+    def reset_history(self, user_id):
+        """Hapus riwayat kopi dan hasil FINDRISC user (tombol Reset Semua Data)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM coffee_entries WHERE user_id = ?", (user_id,))
+            self._conn.execute("DELETE FROM findrisc_results WHERE user_id = ?", (user_id,))
+
+    def add_coffee(self, user_id, data, entry):
+        """Insert satu entri kopi tanpa menulis ulang dokumen"""
+        self.add_coffee_batch(user_id, data, [entry])
+
+    def add_coffee_batch(self, user_id, data, entries, compact=True):
+        """Insert beberapa entri kopi dalam satu transaksi (`data` dan `compact` tidak dipakai)"""
+        with self._lock, self._conn:
+            self._insert_entries(user_id, entries)
+
+    def compact(self, user_id):
+        """Pindahkan isi WAL ke file database (setelah insert massal)"""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def existing_keys(self, user_id, keys):
+        """Bagian dari `keys` (tanggal, minuman) yang sudah ada, lewat index (user_id, timestamp)"""
+        keys = set(keys)
+        dates = sorted({date for date, _ in keys})
+        found = set()
+        with self._lock:
+            # Batas jumlah parameter SQLite versi lama: 999
+            for start in range(0, len(dates), 900):
+                chunk = dates[start:start + 900]
+                rows = self._conn.execute(
+                    "SELECT timestamp, drink FROM coffee_entries "
+                    f"WHERE user_id = ? AND timestamp IN ({','.join('?' * len(chunk))})",
+                    [user_id, *chunk]
+                )
+                found.update(row for row in rows if row in keys)
+        return found
+
+    def _insert_entries(self, user_id, entries):
+        self._conn.executemany(
+            "INSERT INTO coffee_entries "
+            "(user_id, timestamp, drink, volume, quantity, topping, sugar) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [_entry_row(user_id, entry) for entry in entries]
+        )
+
+
+def get_store(folder, kind=None):
+    """Buat store sesuai GLUCOFFEE_STORAGE (default: sqlite)"""
+    kind = kind or os.getenv("GLUCOFFEE_STORAGE", "sqlite")
+    os.makedirs(folder, exist_ok=True)
+    if kind == "json":
+        return JsonStore(folder)
+    if kind == "sqlite":
+        return SqliteStore(os.path.join(folder, DB_FILENAME), legacy_folder=folder)
+    raise ValueError(f"GLUCOFFEE_STORAGE tidak dikenal: {kind}")
+
+
+def migrate_json_to_sqlite(folder, store):
+    """Salin semua file user_*.json ke store SQLite; return jumlah user"""
+    legacy = JsonStore(folder)
+    migrated = 0
+    for user_id in legacy.user_ids():
+        data = legacy.load(user_id)
+        if data is None:
+            print(f"  lewati user_{user_id}.json (tidak bisa dibaca)", file=sys.stderr)
+            continue
+        store.save(user_id, data)
+        migrated += 1
+    return migrated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tool penyimpanan GluCoffee")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="migrasi file JSON lama ke SQLite")
+    migrate.add_argument("--data-folder", default="glucoffee_users")
+    rebuild = sub.add_parser("rebuild-rollups",
+                             help="susun ulang rollup harian di snapshot JSON dari riwayat mentah")
+    rebuild.add_argument("--data-folder", default="glucoffee_users")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        store = SqliteStore(os.path.join(args.data_folder, DB_FILENAME))
+        count = migrate_json_to_sqlite(args.data_folder, store)
+        store.close()
+        print(f"{count} user dimigrasi ke {store.path}", file=sys.stderr)
+    elif args.command == "rebuild-rollups":
+        # SqliteStore selalu menyusun rollup saat load, jadi hanya snapshot JSON yang perlu
+        store = JsonStore(args.data_folder)
+        user_ids = store.user_ids()
+        for user_id in user_ids:
+            data = store.load(user_id)
+            if data is not None:
+                rebuild_rollups(data)
+                store.save(user_id, data)
+        print(f"Rollup {len(user_ids)} user disusun ulang", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Perhitungan gula dari riwayat kopi, tanpa ketergantungan ke Streamlit.
+
+Dokumen user menyimpan rollup per hari di data['daily_rollup']:
+
+    {"2025-10-13": {"sugar": 45.5, "count": 3, "drinks": {"Kopi Susu": 2}}}
+
+Rollup diperbarui setiap kali entri ditambah, sehingga gula hari ini dan
+rata-rata 7 hari cukup membaca beberapa key per hari tanpa memindai seluruh
+riwayat.
+"""
+from datetime import date, timedelta
+
+DAILY_LIMIT = 50
+
+
+def entry_day(entry):
+    """Tanggal ISO (YYYY-MM-DD) dari sebuah entri kopi"""
+    return entry['date'][:10]
+
+
+def add_to_rollup(data, entry):
+    """Masukkan satu entri ke rollup harian"""
+    rollup = data.setdefault('daily_rollup', {})
+    day = rollup.setdefault(entry_day(entry), {"sugar": 0.0, "count": 0, "drinks": {}})
+    day['sugar'] += entry['sugar']
+    day['count'] += 1
+    day['drinks'][entry['drink']] = day['drinks'].get(entry['drink'], 0) + entry['quantity']
+
+
+def rebuild_rollups(data):
+    """Susun ulang rollup harian dari riwayat mentah"""
+    data['daily_rollup'] = {}
+    for entry in data['coffee_history']:
+        add_to_rollup(data, entry)
+    return data['daily_rollup']
+
+
+def ensure_rollups(data):
+    """Rebuild rollup jika dokumen lama belum memilikinya"""
+    if 'daily_rollup' not in data:
+        rebuild_rollups(data)
+    return data['daily_rollup']
+
+
+def window_days(days, today=None):
+    """Daftar tanggal ISO untuk `days` hari terakhir, termasuk hari ini"""
+    today = today or date.today()
+    return [(today - timedelta(days=i)).isoformat() for i in range(days)]
+
+
+def daily_sugar(data, day=None):
+    """Total gula pada satu hari (default hari ini)"""
+    day = (day or date.today()).isoformat()
+    rollup = ensure_rollups(data).get(day)
+    return rollup['sugar'] if rollup else 0
+
+
+def window_average(data, days, today=None):
+    """Rata-rata gula per hari aktif dalam `days` hari terakhir"""
+    rollup = ensure_rollups(data)
+    totals = [rollup[day]['sugar'] for day in window_days(days, today) if day in rollup]
+    return sum(totals) / len(totals) if totals else 0
+
+
+def weekly_average(data, today=None):
+    """Rata-rata gula per hari aktif dalam 7 hari terakhir"""
+    return window_average(data, 7, today)
@@ -0,0 +1,48 @@
+import time
+
+from ai_budget import await_first_token
+
+
+class FakeJob:
+    def __init__(self, has_text=False, done=False):
+        self.started_at = time.perf_counter()
+        self.has_text = has_text
+        self.done = done
+
+    def wait_first_token(self, timeout):
+        time.sleep(timeout)
+
+
+def test_fast_failing_primary_starts_hedge():
+    primary = FakeJob(done=True)
+    hedge = FakeJob(has_text=True, done=True)
+    started = []
+
+    def start_hedge():
+        started.append(hedge)
+        return hedge
+
+    job, label = await_first_token(primary, start_hedge, hedge_after=3, deadline=8)
+    assert (job, label) == (hedge, "hedge")
+    assert len(started) == 1
+    assert time.perf_counter() - primary.started_at < 1
+
+
+def test_fast_failing_primary_without_hedge_gives_up():
+    primary = FakeJob(done=True)
+
+    def start_hedge():
+        raise AssertionError("hedge dinonaktifkan")
+
+    assert await_first_token(primary, start_hedge, hedge_after=0, deadline=8) == (None, None)
+
+
+def test_failed_hedge_after_failed_primary_gives_up():
+    primary = FakeJob(done=True)
+    assert await_first_token(primary, lambda: FakeJob(done=True), hedge_after=3, deadline=8) == (None, None)
+
+
+def test_deadline_without_text():
+    primary = FakeJob()
+    job, label = await_first_token(primary, FakeJob, hedge_after=0.05, deadline=0.2)
+    assert (job, label) == (None, None)
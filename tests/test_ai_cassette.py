@@ -0,0 +1,45 @@
+from ai_cassette import Cassette, LatencyModel, RecordingModel, ReplayModel, prompt_hash
+from ai_prompt import build_prompt
+from storage import init_data_structure
+
+NAME = "Budi Santoso"
+ANSWERS = {"usia": "55-64 tahun", "bmi": "Lebih dari 30"}
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class GreetingModel:
+    """Respons menyapa user dengan nama, nama terpotong di batas potongan"""
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        return iter([Chunk("Halo Budi "), Chunk("Santoso! "), Chunk(f"Semangat, {NAME}.")])
+
+
+def user_prompt():
+    # Lewat build_prompt asli supaya perubahan format blok data ikut teruji
+    data = init_data_structure()
+    data['user_profile'] = {"name": NAME, "created_at": "2026-01-01T00:00:00"}
+    data['findrisc'] = {"score": 17, "risk_level": "Tinggi",
+                        "last_updated": "2026-01-01T00:00:00", "raw_answers": ANSWERS}
+    return build_prompt(data, 12.5, 30.0)
+
+
+def test_recording_redacts_personal_data_and_replay_still_matches(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    prompt = user_prompt()
+    recorder = RecordingModel("gemini-test", GreetingModel(), Cassette(str(path)))
+    streamed = "".join(chunk.text for chunk in recorder.generate_content(prompt, stream=True))
+    assert NAME in streamed
+
+    content = path.read_text(encoding="utf-8")
+    for secret in ["Budi", "Santoso", "17 poin", "Tinggi", *ANSWERS.values()]:
+        assert secret not in content
+    assert prompt_hash(prompt) in content
+
+    replay = ReplayModel("gemini-test", Cassette(str(path)), latency=LatencyModel("none"), miss="error")
+    text = replay.generate_content(prompt).text
+    assert text.startswith("Halo ")
+    assert "Budi" not in text
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from ai_client import FAILURE_THRESHOLD, ModelRoute, ModelRouter
+
+
+class BlockingModel:
+    """Model yang menahan setiap request sampai `release` di-set"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        self.release.wait(5)
+        return "half-open"
+
+
+class FastModel:
+    def generate_content(self, prompt, stream=False, **kwargs):
+        return "fallback"
+
+
+def half_open_route(name, model):
+    route = ModelRoute(name, model)
+    route.consecutive_failures = FAILURE_THRESHOLD
+    route.open_until = time.monotonic() - 1
+    return route
+
+
+def test_half_open_route_gets_single_trial_from_concurrent_callers():
+    trial = BlockingModel()
+    router = ModelRouter([half_open_route("pulih", trial), ModelRoute("cadangan", FastModel())])
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(router.generate_content("p")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    # Semua request selain percobaan langsung dilayani model cadangan
+    deadline = time.monotonic() + 5
+    while len(results) < 7 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert trial.calls == 1
+    assert results.count("fallback") == 7
+
+    trial.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results.count("half-open") == 1
+    assert router.snapshot()[0]["state"] == "closed"
+
+
+def test_failed_trial_reopens_circuit():
+    class BrokenModel:
+        calls = 0
+
+        def generate_content(self, prompt, stream=False, **kwargs):
+            BrokenModel.calls += 1
+            raise RuntimeError("masih gagal")
+
+    router = ModelRouter([half_open_route("rusak", BrokenModel()), ModelRoute("cadangan", FastModel())])
+    assert router.generate_content("p") == "fallback"
+    assert router.generate_content("p") == "fallback"
+    assert BrokenModel.calls == 1
+    assert router.snapshot()[0]["state"] == "open"
+
+
+def test_gate_slot_released_when_stream_consumer_fails():
+    from ai_client import RequestGate
+    from ai_stream import RecommendationStream
+
+    class BlockedChunk:
+        @property
+        def text(self):
+            # Seperti SDK saat potongan diblokir filter keamanan
+            raise ValueError("potongan diblokir")
+
+    class BlockedModel:
+        def generate_content(self, prompt, stream=False, **kwargs):
+            return iter([BlockedChunk()])
+
+    gate = RequestGate(2, 0)
+    router = ModelRouter([ModelRoute("diblokir", BlockedModel())], gate=gate)
+    jobs = [RecommendationStream(router, "p") for _ in range(2)]
+    for job in jobs:
+        job._thread.join(5)
+
+    # Job gagal masih dipegang (seperti di session_state), slot harus sudah lepas
+    assert all(isinstance(job.error, ValueError) for job in jobs)
+    assert gate.stats()["active"] == 0
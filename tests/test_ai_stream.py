@@ -0,0 +1,44 @@
+from ai_budget import await_first_token
+from ai_stream import RecommendationStream
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class StreamModel:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        return iter([Chunk(text) for text in self.chunks])
+
+
+def finished_job(chunks, cache):
+    job = RecommendationStream(StreamModel(chunks), "p", key="k",
+                               on_complete=lambda text: cache.__setitem__("k", text))
+    job._thread.join(5)
+    return job
+
+
+def test_empty_stream_is_not_cached():
+    cache = {}
+    job = finished_job([], cache)
+    assert job.done and job.error is None
+    assert "k" not in cache
+
+
+def test_blank_stream_counts_as_failure():
+    cache = {}
+    job = finished_job(["", "  \n"], cache)
+    assert "k" not in cache
+    assert not job.has_text
+    assert await_first_token(job, lambda: finished_job([], cache), hedge_after=3, deadline=8) == (None, None)
+
+
+def test_stream_with_text_is_cached():
+    cache = {}
+    job = finished_job(["Halo", " dunia"], cache)
+    assert cache == {"k": "Halo dunia"}
+    assert await_first_token(job, None, hedge_after=0, deadline=8) == (job, "primary")